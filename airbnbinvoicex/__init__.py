@@ -0,0 +1 @@
+"""Command line entry points for the Airbnb Invoice Downloader (see __main__.py)."""
@@ -0,0 +1,136 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import uuid
+from threading import Event, Thread
+
+# app.py lives next to this package rather than inside it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Header names recognised for the booking column of an export CSV, after normalize_header
+BOOKING_COLUMNS = ('booking_number', 'booking', 'confirmation_code', 'code')
+
+
+def normalize_header(cell):
+    # Airbnb's own reservations export calls the column "Confirmation code"
+    return re.sub(r'[\s-]+', '_', cell.strip().lower())
+
+
+def read_booking_numbers(path):
+    # The booking column is taken from the header when there is one, else the first column is used
+    # utf-8-sig drops the byte order mark spreadsheet exports often start with
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        rows = [row for row in csv.reader(f) if any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    column = 0
+    header = [normalize_header(cell) for cell in rows[0]]
+    for name in BOOKING_COLUMNS:
+        if name in header:
+            column = header.index(name)
+            rows = rows[1:]
+            break
+
+    booking_numbers = []
+    seen = set()
+    for row in rows:
+        number = row[column].strip() if column < len(row) else ''
+        if number and number not in seen:
+            seen.add(number)
+            booking_numbers.append(number)
+    return booking_numbers
+
+
+def emit(event, **fields):
+    # One JSON object per line on stdout; logging goes to stderr
+    print(json.dumps(dict(event=event, **fields)), flush=True)
+
+
+def export(args):
+    try:
+        booking_numbers = read_booking_numbers(args.input)
+    except OSError as e:
+        print(f"Cannot read {args.input}: {e}", file=sys.stderr)
+        return 2
+    if not booking_numbers:
+        print(f"No booking numbers found in {args.input}", file=sys.stderr)
+        return 2
+
+    # Every export worker needs its own pooled driver
+    pool_size = int(os.environ.get('DRIVER_POOL_SIZE', '2'))
+    os.environ['DRIVER_POOL_SIZE'] = str(max(pool_size, args.workers))
+    import app
+
+    job_id = f"export-{uuid.uuid4().hex}"
+    os.makedirs(args.out, exist_ok=True)
+    emit('started', job_id=job_id, total=len(booking_numbers))
+
+    finished = Event()
+
+    def report_progress():
+        version = None
+        while not finished.is_set():
+            new_version, data = app.JOB_STATE.wait(job_id, version, 1)
+            if data is None:
+                # The job has not published its state yet
+                finished.wait(0.1)
+            elif new_version != version:
+                version = new_version
+                emit('progress', job_id=job_id, **data)
+
+    reporter = Thread(target=report_progress, daemon=True)
+    reporter.start()
+    try:
+        # Cron has nobody to complete a login, so only the saved cookie session is used
+        downloaded, _, failed, zip_path = app.scrape_airbnb_invoices(
+            booking_numbers, manual_mfa=False, job_id=job_id, workers=args.workers,
+            force_refresh=args.force_refresh, download_dir=args.out,
+        )
+    finally:
+        finished.set()
+        reporter.join()
+
+    state = app.JOB_STATE.get(job_id) or {}
+    emit(
+        'done', job_id=job_id, archive=os.path.abspath(zip_path), total=len(booking_numbers),
+        invoices=len(downloaded), failed=failed, failure_reasons=state.get('failure_reasons', {}),
+        no_invoice_bookings=state.get('no_invoice_bookings', []),
+    )
+    if failed:
+        print(f"Failed bookings: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def worker(args):
+    # Importing app reads the JOB_* settings, so the broker has to be selected first
+    os.environ.setdefault('JOB_EXECUTION', 'broker')
+    import app
+    app.run_job_worker(concurrency=args.concurrency)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m airbnbinvoicex')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help='download the invoices of a CSV of bookings unattended')
+    export_parser.add_argument('--input', required=True, help='CSV file with one booking number per row')
+    export_parser.add_argument('--out', required=True, help='directory the invoice archive is written to')
+    export_parser.add_argument('--workers', type=int, default=1, help='headless drivers to split the bookings across')
+    export_parser.add_argument('--force-refresh', action='store_true', help='ignore previously cached invoices')
+    export_parser.set_defaults(handler=export)
+
+    worker_parser = commands.add_parser('worker', help='run jobs queued by the web app (JOB_EXECUTION=broker)')
+    worker_parser.add_argument('--concurrency', type=int, default=1, help='jobs this process runs at once')
+    worker_parser.set_defaults(handler=worker)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
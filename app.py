@@ -1,23 +1,42 @@
 from dotenv import load_dotenv
 load_dotenv()
-from flask import Flask, render_template, request, send_file, session, redirect, url_for, abort, jsonify
+from flask import Flask, render_template, request, session, redirect, url_for, abort, jsonify, make_response, stream_with_context
+
+import requests
+from requests.adapters import HTTPAdapter
 
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, NoSuchWindowException
 
 
 
-from threading import Timer, Lock, Thread
+from threading import Timer, Lock, Thread, Condition, Event
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+import atexit
 import uuid
 import time
 import zipfile
+import io
 import os
 import shutil
 import base64
 import json
+import re
+import hashlib
+import heapq
+import random
+import sqlite3
+import struct
+import signal
+import socket
+import zlib
+from urllib.parse import urljoin, urlparse
 
 import logging
 from selenium.webdriver.remote.remote_connection import LOGGER as selenium_logger
@@ -36,13 +55,179 @@ if not SECRET_KEY:
 # Set the Flask app's secret key
 app.secret_key = SECRET_KEY
 
-# Simple in-memory progress store keyed by client_id
-PROGRESS = {}
-PROGRESS_LOCK = Lock()
-
 
-
-def initialize_driver(download_dir, headless=True):
+# Jobs still in flight as idempotency key -> (job id, submission fingerprint), so a double submit reuses the running job
+ACTIVE_JOBS = {}
+ACTIVE_JOBS_LOCK = Lock()
+
+# Archives of running and recently finished jobs, for streaming downloads
+JOB_ARCHIVES = {}
+JOB_ARCHIVES_LOCK = Lock()
+
+# Adaptive rate limiters keyed by account (cookie file path)
+RATE_LIMITERS = {}
+RATE_LIMITERS_LOCK = Lock()
+
+# Per-driver scratch state (e.g. the background print tab) keyed by WebDriver session id
+DRIVER_STATE = {}
+DRIVER_STATE_LOCK = Lock()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DOWNLOAD_DIR = os.path.join(BASE_DIR, 'invoice_downloads')
+COOKIE_FILE_PATH = os.path.join(BASE_DIR, 'session_cookies.json')
+
+# Warm driver pool settings (drivers are recycled after a page or age budget)
+DRIVER_POOL_SIZE = int(os.environ.get('DRIVER_POOL_SIZE', '2'))
+DRIVER_MAX_PAGES = int(os.environ.get('DRIVER_MAX_PAGES', '300'))
+DRIVER_MAX_AGE = int(os.environ.get('DRIVER_MAX_AGE', '1800'))  # seconds
+DRIVER_ACQUIRE_TIMEOUT = int(os.environ.get('DRIVER_ACQUIRE_TIMEOUT', '600'))  # seconds
+
+# Requests headless drivers never need for finding or printing invoices (Network.setBlockedURLs
+# wildcards). CDP URL blocking has no way to express exceptions, so UNBLOCKED_URL_PATTERNS names
+# whole block patterns to drop rather than URLs to let through.
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    "*.woff*", "*.ttf*", "*.otf*", "*.eot*",
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*",
+    "*.mp4*", "*.webm*", "*.m3u8*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*facebook.com/tr*", "*branch.io*", "*hotjar.com*", "*sentry.io*",
+    "*/tracking/*",
+]
+
+
+def env_list(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return list(default)
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+BLOCKED_URL_PATTERNS = env_list('BLOCKED_URL_PATTERNS', DEFAULT_BLOCKED_URL_PATTERNS)
+UNBLOCKED_URL_PATTERNS = env_list('UNBLOCKED_URL_PATTERNS', [])
+# An entry that is not a block pattern would silently do nothing, so refuse to start instead
+for pattern in UNBLOCKED_URL_PATTERNS:
+    if pattern not in BLOCKED_URL_PATTERNS:
+        raise ValueError(f"UNBLOCKED_URL_PATTERNS entry {pattern!r} is not one of the BLOCKED_URL_PATTERNS")
+BLOCKED_URLS = [pattern for pattern in BLOCKED_URL_PATTERNS if pattern not in UNBLOCKED_URL_PATTERNS]
+# Typical transfer sizes used to estimate what a blocked request would have cost, bytes
+BLOCKED_BYTES_ESTIMATE = {
+    'Font': 40000, 'Image': 25000, 'Media': 500000, 'Script': 60000, 'Stylesheet': 20000, 'Other': 5000,
+}
+
+# In-page readiness waits resolve as soon as the page is ready; these are only upper bounds
+SCRIPT_TIMEOUT = 60  # seconds
+SETTLE_QUIET_MS = int(os.environ.get('SETTLE_QUIET_MS', '300'))
+# Switch bookings through the reservations app's client-side router instead of reloading it;
+# a driver falls back to full page loads after SPA_MAX_FAILURES failures in a row
+SPA_NAVIGATION = os.environ.get('SPA_NAVIGATION', '1') == '1'
+SPA_NAVIGATION_TIMEOUT = int(os.environ.get('SPA_NAVIGATION_TIMEOUT', '5'))  # seconds
+SPA_MAX_FAILURES = int(os.environ.get('SPA_MAX_FAILURES', '3'))
+
+INVOICE_LINK_XPATH = "//a[contains(@href, '/vat_invoices/')]"
+# Keys under which the reservations API names a booking's confirmation code
+BOOKING_CODE_KEYS = ('confirmation_code', 'confirmationCode', 'reservation_code', 'reservationCode', 'code')
+INVOICE_PATH_RE = re.compile(r'/vat_invoices/[A-Za-z0-9_-]+(?:\?[^"\s<>\\]*)?')
+
+# Where invoice links come from: 'dom' reads the rendered page, 'network' reads the JSON the
+# reservations app fetches (no waiting for lazy rendering), 'auto' tries network then the DOM
+INVOICE_DISCOVERY = os.environ.get('INVOICE_DISCOVERY', 'dom')
+
+PDF_CHUNK_SIZE = int(os.environ.get('PDF_CHUNK_SIZE', str(256 * 1024)))  # bytes per IO.read
+
+# Invoice fetch engine: 'browser' opens each invoice in Chrome, 'http' fetches it with the
+# saved session cookies and only uses Chrome (the renderer pool) to print the PDF
+INVOICE_FETCH_MODE = os.environ.get('INVOICE_FETCH_MODE', 'browser')
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', '16'))
+HTTP_FETCH_WORKERS = int(os.environ.get('HTTP_FETCH_WORKERS', '4'))
+HTTP_TIMEOUT = int(os.environ.get('HTTP_TIMEOUT', '20'))  # seconds
+RENDERER_POOL_SIZE = int(os.environ.get('RENDERER_POOL_SIZE', '2'))
+
+# Rendered invoices are kept across jobs so reruns skip work already done
+INVOICE_CACHE_ENABLED = os.environ.get('INVOICE_CACHE', '1') == '1'
+INVOICE_CACHE_DIR = os.environ.get('INVOICE_CACHE_DIR', os.path.join(BASE_DIR, 'invoice_cache'))
+INVOICE_CACHE_TTL = int(os.environ.get('INVOICE_CACHE_TTL', str(30 * 24 * 3600)))  # seconds
+# A booking's link list goes stale much sooner: Airbnb issues new invoices after alterations
+INVOICE_LINKS_TTL = int(os.environ.get('INVOICE_LINKS_TTL', '3600'))  # seconds
+INVOICE_CACHE_MAX_BYTES = int(os.environ.get('INVOICE_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+INVOICE_CACHE_SWEEP_INTERVAL = 3600  # seconds between sweeps for expired entries
+
+# Outcome of one booking attempt. Only transient and rendering failures are worth retrying;
+# a booking without invoices counts as done.
+OUTCOME_OK = 'ok'
+OUTCOME_NOT_FOUND = 'not_found'
+OUTCOME_NO_INVOICES = 'no_invoices'
+OUTCOME_SESSION_EXPIRED = 'session_expired'
+OUTCOME_TRANSIENT = 'transient'
+OUTCOME_RENDER_FAILED = 'render_failed'
+SUCCESS_OUTCOMES = {OUTCOME_OK, OUTCOME_NO_INVOICES}
+RETRYABLE_OUTCOMES = {OUTCOME_TRANSIENT, OUTCOME_RENDER_FAILED}
+# Re-authentications a single job may run after its session expires mid-run
+MAX_REAUTHENTICATIONS = int(os.environ.get('MAX_REAUTHENTICATIONS', '1'))
+# How long a booking page must stay quiet before it is judged to have no invoices or not exist
+BOOKING_STATE_QUIET_MS = int(os.environ.get('BOOKING_STATE_QUIET_MS', '2000'))
+
+# Failed bookings are retried later with jittered exponential backoff, up to this many attempts
+MAX_BOOKING_ATTEMPTS = int(os.environ.get('MAX_BOOKING_ATTEMPTS', '6'))
+RETRY_BASE_DELAY = float(os.environ.get('RETRY_BASE_DELAY', '2'))  # seconds
+RETRY_MAX_DELAY = float(os.environ.get('RETRY_MAX_DELAY', '60'))  # seconds
+
+# Seconds between keepalive comments on an idle progress event stream
+PROGRESS_KEEPALIVE = int(os.environ.get('PROGRESS_KEEPALIVE', '15'))
+# A live ZIP stream gives up when no invoice has been added for this long. WSGI only notices a gone
+# client on the next write, and the stream has nothing to write while it waits.
+STREAM_IDLE_TIMEOUT = int(os.environ.get('STREAM_IDLE_TIMEOUT', '900'))  # seconds
+
+# Every navigation for an account (cookie file) shares one adaptive token bucket: the rate grows
+# additively while Airbnb answers quickly and is cut multiplicatively on errors, 429s or slow pages
+RATE_LIMIT_INITIAL = float(os.environ.get('RATE_LIMIT_INITIAL', '1'))  # navigations per second
+RATE_LIMIT_MIN = float(os.environ.get('RATE_LIMIT_MIN', '0.2'))
+RATE_LIMIT_MAX = float(os.environ.get('RATE_LIMIT_MAX', '4'))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', '2'))
+RATE_LIMIT_INCREASE = float(os.environ.get('RATE_LIMIT_INCREASE', '0.1'))
+RATE_LIMIT_DECREASE = float(os.environ.get('RATE_LIMIT_DECREASE', '0.5'))
+RATE_LIMIT_TARGET_LATENCY = float(os.environ.get('RATE_LIMIT_TARGET_LATENCY', '5'))  # seconds
+
+# Parallel scraping: bookings are shared across this many headless drivers per job
+SCRAPE_WORKERS = int(os.environ.get('SCRAPE_WORKERS', '1'))
+MAX_SCRAPE_WORKERS = int(os.environ.get('MAX_SCRAPE_WORKERS', '4'))  # politeness cap
+WORKER_ACQUIRE_TIMEOUT = int(os.environ.get('WORKER_ACQUIRE_TIMEOUT', '5'))  # seconds
+
+# Job scheduling: at most JOB_WORKERS jobs run at once and JOB_QUEUE_SIZE more may wait;
+# further submissions are turned away with HTTP 429
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '1'))
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', '10'))
+JOB_ESTIMATED_SECONDS = float(os.environ.get('JOB_ESTIMATED_SECONDS', '120'))  # until real jobs are timed
+# 'thread' runs jobs inside the web process; 'broker' only queues them in a SQLite broker that
+# separately launched workers (python -m airbnbinvoicex worker) claim and run
+JOB_EXECUTION = os.environ.get('JOB_EXECUTION', 'thread')
+JOB_BROKER_DB = os.environ.get('JOB_BROKER_DB', os.path.join(BASE_DIR, 'job_broker.sqlite3'))
+JOB_BROKER_POLL_INTERVAL = float(os.environ.get('JOB_BROKER_POLL_INTERVAL', '1'))  # seconds between claims
+JOB_BROKER_HEARTBEAT = float(os.environ.get('JOB_BROKER_HEARTBEAT', '30'))  # seconds
+JOB_BROKER_STALE = float(os.environ.get('JOB_BROKER_STALE', '300'))  # requeue jobs of silent workers
+# On SIGTERM or Ctrl-C a worker stops claiming and gives running jobs this long to finish
+JOB_WORKER_DRAIN_TIMEOUT = float(os.environ.get('JOB_WORKER_DRAIN_TIMEOUT', '60'))  # seconds
+# 'memory' keeps each account's rate limiter in this process; 'sqlite' keeps the bucket in a database
+# file so worker processes and CLI exports for the same account share one budget
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'sqlite' if JOB_EXECUTION == 'broker' else 'memory')
+RATE_LIMIT_DB = os.environ.get('RATE_LIMIT_DB', JOB_BROKER_DB)
+
+# Finished jobs' progress is forgotten after JOB_STATE_TTL, or sooner once more than
+# JOB_STATE_MAX_JOBS are tracked; running jobs are never evicted
+JOB_STATE_TTL = int(os.environ.get('JOB_STATE_TTL', '3600'))  # seconds
+JOB_STATE_MAX_JOBS = int(os.environ.get('JOB_STATE_MAX_JOBS', '1000'))
+# 'memory' keeps job state in this process; 'sqlite' shares it through a database file so any
+# process of a multi-process server (e.g. gunicorn workers) can report on any job. Brokered
+# jobs run in other processes, so their state is shared by default.
+JOB_STATE_BACKEND = os.environ.get('JOB_STATE_BACKEND', 'sqlite' if JOB_EXECUTION == 'broker' else 'memory')
+JOB_STATE_DB = os.environ.get('JOB_STATE_DB', os.path.join(BASE_DIR, 'job_state.sqlite3'))
+JOB_STATE_POLL_INTERVAL = float(os.environ.get('JOB_STATE_POLL_INTERVAL', '0.5'))  # seconds, for event streams
+
+# A finished job's directory (and archive) lives this long, plus as long as a download is in flight
+JOB_OUTPUT_TTL = int(os.environ.get('JOB_OUTPUT_TTL', '3600'))  # seconds
+
+
+
+def initialize_driver(download_dir, headless=True, network_log=False):
     # Set the Selenium logger to only display critical errors
     selenium_logger.setLevel(logging.CRITICAL)
 
@@ -50,6 +235,9 @@ def initialize_driver(download_dir, headless=True):
     # Enable headless mode if requested
     if headless:
         chrome_options.add_argument("--headless")
+    # Network events (blocked requests, bytes received, API responses) are read back from the performance log
+    if network_log:
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
 
     # Performance optimizations that are safe and won't trigger rate limiting
     chrome_options.add_argument("--no-sandbox")
@@ -86,33 +274,131 @@ def initialize_driver(download_dir, headless=True):
     # Set timeouts for faster failure detection
     driver.set_page_load_timeout(30)
     driver.implicitly_wait(3)  # Reduced from default 10s
+    driver.set_script_timeout(SCRIPT_TIMEOUT)  # Upper bound for in-page readiness waits
+
+    if network_log:
+        driver.execute_cdp_cmd("Network.enable", {})
+
+    # The visible login browser loads everything; headless drivers skip what scraping never needs
+    if headless:
+        apply_request_blocking(driver)
     
     return driver
 
 
-def cleanup_files(file_paths, download_dir):
-    # Logging the start of the cleanup process
-    logging.info("Starting cleanup process.")
+def apply_request_blocking(driver):
+    if not BLOCKED_URLS:
+        return
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {'urls': BLOCKED_URLS})
 
-    for file_path in file_paths:
-        # Check if the file is in the download directory and is a PDF (as an example)
-        if file_path.startswith(download_dir) and file_path.endswith(".pdf"):
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    logging.info(f"Deleted file: {file_path}")
-            except Exception as e:
-                logging.error(f"Error deleting file {file_path}: {str(e)}")
 
-    # Optionally, remove the directory if it's empty
-    if os.path.exists(download_dir) and not os.listdir(download_dir):
+def drain_network_events(driver):
+    # Reading the performance log also clears it, so each call returns only new events.
+    # Every drained event is counted in the driver's running stats (see take_network_stats).
+    try:
+        entries = driver.get_log('performance')
+    except Exception:
+        return []
+    events = []
+    for entry in entries:
         try:
-            shutil.rmtree(download_dir)
-            logging.info(f"Deleted directory: {download_dir}")
-        except Exception as e:
-            logging.error(f"Error deleting directory {download_dir}: {str(e)}")
+            message = json.loads(entry['message'])['message']
+        except (KeyError, TypeError, ValueError):
+            continue
+        if message.get('method', '').startswith('Network.'):
+            events.append(message)
+    state = driver_state(driver)
+    tally_network_events(events, state.setdefault('network_stats', new_network_stats()))
+    for event in events:
+        # Airbnb answering 401 means the session cookies are no longer accepted
+        response = event.get('params', {}).get('response', {})
+        if event['method'] == 'Network.responseReceived' and response.get('status') == 401 \
+                and 'airbnb.' in response.get('url', ''):
+            state['unauthorized'] = True
+        elif event['method'] == 'Network.responseReceived' and response.get('status') == 429:
+            state['throttled'] = True
+    return events
+
+
+def take_network_stats(driver):
+    drain_network_events(driver)
+    return driver_state(driver).pop('network_stats', new_network_stats())
+
+
+def new_network_stats():
+    return {'requests': 0, 'bytes_received': 0, 'blocked_requests': 0, 'bytes_saved_estimate': 0}
+
+
+def tally_network_events(events, stats):
+    for event in events:
+        params = event.get('params', {})
+        if event['method'] == 'Network.loadingFinished':
+            stats['requests'] += 1
+            stats['bytes_received'] += int(params.get('encodedDataLength', 0))
+        elif event['method'] == 'Network.loadingFailed' and params.get('blockedReason') == 'inspector':
+            # Blocked requests never report a size, so savings are estimated per resource type
+            stats['blocked_requests'] += 1
+            stats['bytes_saved_estimate'] += BLOCKED_BYTES_ESTIMATE.get(
+                params.get('type'), BLOCKED_BYTES_ESTIMATE['Other']
+            )
+
 
-    logging.info("Cleanup process completed.")
+def cleanup_files(download_dir):
+    # Remove a job's working directory with everything in it (invoices, archive, screenshots)
+    logging.info(f"Starting cleanup of {download_dir}")
+    try:
+        shutil.rmtree(download_dir)
+        logging.info(f"Deleted directory: {download_dir}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.error(f"Error deleting directory {download_dir}: {str(e)}")
+
+
+class JobWorkspaces:
+    """Per-job working directories under one root, deleted once nothing references them."""
+
+    def __init__(self, root):
+        self.root = root
+        self._refs = {}  # directory -> reference count
+        self._foreign = set()  # directories another process created; never deleted from here
+        self._lock = Lock()
+
+    def create(self, job_id):
+        # The creating job holds the first reference
+        directory = os.path.join(self.root, job_id)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._refs[directory] = self._refs.get(directory, 0) + 1
+        return directory
+
+    def acquire(self, job_id):
+        # Returns the directory while it is still alive (e.g. for a download), else None
+        directory = os.path.join(self.root, job_id)
+        with self._lock:
+            if directory not in self._refs:
+                # A job run by another process sharing the download directory
+                if not os.path.isdir(directory):
+                    return None
+                self._refs[directory] = 0
+                self._foreign.add(directory)
+            self._refs[directory] += 1
+        return directory
+
+    def release(self, directory):
+        with self._lock:
+            self._refs[directory] -= 1
+            if self._refs[directory] > 0:
+                return
+            del self._refs[directory]
+            if directory in self._foreign:
+                self._foreign.discard(directory)
+                return
+        cleanup_files(directory)
+
+
+JOB_WORKSPACES = JobWorkspaces(DOWNLOAD_DIR)
 
 
 
@@ -171,30 +457,48 @@ def save_session_cookies(driver, cookie_file_path):
         logging.info(f"Failed to save cookies: {e}")
 
 
+def login_with_visible_browser(download_dir, cookie_file_path):
+    # The user completes login (including MFA) in a visible browser; its cookies are saved and returned
+    driver_visible = initialize_driver(download_dir, headless=False)
+    try:
+        login_to_airbnb(driver_visible, manual_mfa=True)
+        save_session_cookies(driver_visible, cookie_file_path)
+        return driver_visible.get_cookies()
+    finally:
+        # Close visible browser now that the session is authenticated
+        driver_visible.quit()
+
+
+def apply_cookies(driver, cookies):
+    # Must be on the domain before adding cookies
+    with rate_limited(driver):
+        driver.get("https://www.airbnb.com/")
+    for cookie in cookies:
+        sanitized = {
+            'name': cookie.get('name'),
+            'value': cookie.get('value'),
+            'domain': cookie.get('domain'),
+            'path': cookie.get('path', '/'),
+            'secure': cookie.get('secure', False),
+        }
+        if 'expiry' in cookie:
+            sanitized['expiry'] = cookie['expiry']
+        try:
+            driver.add_cookie(sanitized)
+        except Exception as e:
+            logging.info(f"Skipping cookie add error for {sanitized.get('name')}: {e}")
+
+
 def load_session_cookies(driver, cookie_file_path):
     try:
         if not os.path.isfile(cookie_file_path):
             return False
         with open(cookie_file_path, 'r') as f:
             cookies = json.load(f)
-        # Must be on the domain before adding cookies
-        driver.get("https://www.airbnb.com/")
-        for cookie in cookies:
-            sanitized = {
-                'name': cookie.get('name'),
-                'value': cookie.get('value'),
-                'domain': cookie.get('domain'),
-                'path': cookie.get('path', '/'),
-                'secure': cookie.get('secure', False),
-            }
-            if 'expiry' in cookie:
-                sanitized['expiry'] = cookie['expiry']
-            try:
-                driver.add_cookie(sanitized)
-            except Exception as e:
-                logging.info(f"Skipping cookie add error for {sanitized.get('name')}: {e}")
+        apply_cookies(driver, cookies)
         # Verify by navigating to an authenticated page
-        driver.get("https://www.airbnb.com/hosting/reservations/all")
+        with rate_limited(driver):
+            driver.get("https://www.airbnb.com/hosting/reservations/all")
         if 'login' in driver.current_url:
             return False
         return True
@@ -202,105 +506,1003 @@ def load_session_cookies(driver, cookie_file_path):
         logging.info(f"Failed to load cookies: {e}")
         return False
 
-def download_invoice(driver, booking_number, download_dir):
-    downloaded_file_paths = []
-    logging.info(f"Starting download for booking number {booking_number}")
+class RateLimiter:
+    """Token bucket shared by everything that navigates for one Airbnb account, tuned by AIMD."""
+
+    def __init__(self, rate, min_rate, max_rate, burst, increase, decrease, target_latency):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._last_decrease = 0
+        self._lock = Lock()
+
+    def acquire(self):
+        with self._lock:
+            wait = self._take(time.monotonic())
+        if wait:
+            time.sleep(wait)
+
+    def record(self, latency=None, error=False):
+        with self._lock:
+            self._adjust(time.monotonic(), latency, error)
+
+    def _take(self, now):
+        # Callers reserve a token even when the bucket is empty and sleep until it is theirs,
+        # so concurrent workers are spaced out instead of racing
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def _adjust(self, now, latency, error):
+        if error or (latency is not None and latency > self.target_latency):
+            # Several workers often see the same slowdown; back off once per second at most
+            if now - self._last_decrease >= 1:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._last_decrease = now
+        elif latency is not None:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    @contextmanager
+    def navigation(self):
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.record(error=True)
+            raise
+        self.record(latency=time.monotonic() - started)
+
+
+class SqliteRateLimiter(RateLimiter):
+    """RateLimiter whose bucket lives in SQLite, so worker processes and CLI exports share one budget."""
+
+    def __init__(self, path, account, *settings):
+        super().__init__(*settings)
+        self.path = path
+        self.account = account
+        self.initial_rate = self.rate
+        self._db = None
+
+    def acquire(self):
+        wait = self._shared(self._take)
+        if wait:
+            time.sleep(wait)
+
+    def record(self, latency=None, error=False):
+        self._shared(self._adjust, latency, error)
+
+    def _shared(self, step, *args):
+        # Load the account's bucket, apply one step and store it, all in one write transaction.
+        # Wall-clock time, since the timestamps are compared across processes.
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = db.execute(
+                    "SELECT rate, tokens, updated, last_decrease FROM rate_limits WHERE account = ?", (self.account,)
+                ).fetchone()
+                self.rate, self._tokens, self._updated, self._last_decrease = row or (
+                    self.initial_rate, self.burst, now, 0
+                )
+                result = step(now, *args)
+                db.execute(
+                    "INSERT OR REPLACE INTO rate_limits (account, rate, tokens, updated, last_decrease) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.account, self.rate, self._tokens, self._updated, self._last_decrease),
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return result
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Autocommit mode; transactions are opened explicitly in _shared
+            self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits "
+                "(account TEXT PRIMARY KEY, rate REAL, tokens REAL, updated REAL, last_decrease REAL)"
+            )
+        return self._db
+
+
+def get_rate_limiter(cookie_file_path):
+    key = os.path.abspath(cookie_file_path)
+    settings = (
+        RATE_LIMIT_INITIAL, RATE_LIMIT_MIN, RATE_LIMIT_MAX, RATE_LIMIT_BURST,
+        RATE_LIMIT_INCREASE, RATE_LIMIT_DECREASE, RATE_LIMIT_TARGET_LATENCY,
+    )
+    with RATE_LIMITERS_LOCK:
+        if key not in RATE_LIMITERS:
+            if RATE_LIMIT_BACKEND == 'sqlite':
+                RATE_LIMITERS[key] = SqliteRateLimiter(RATE_LIMIT_DB, key, *settings)
+            else:
+                RATE_LIMITERS[key] = RateLimiter(*settings)
+        return RATE_LIMITERS[key]
+
+
+def rate_limited(driver):
+    # Navigations by a driver working for a job go through that account's limiter
+    limiter = driver_state(driver).get('rate_limiter')
+    return limiter.navigation() if limiter is not None else nullcontext()
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """Sends every HTTP request through the account's shared rate limiter."""
+
+    def __init__(self, limiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.limiter.acquire()
+        started = time.monotonic()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            self.limiter.record(error=True)
+            raise
+        throttled = response.status_code == 429 or response.status_code >= 500
+        self.limiter.record(latency=time.monotonic() - started, error=throttled)
+        return response
+
+
+class DriverPool:
+    """Keeps authenticated headless drivers alive between jobs."""
+
+    def __init__(self, size, max_pages, max_age, download_dir, cookie_file_path, authenticate=True,
+                 network_log=True):
+        self.size = size
+        self.authenticate = authenticate
+        self.network_log = network_log
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self.download_dir = download_dir
+        self.cookie_file_path = cookie_file_path
+        self._idle = []
+        self._meta = {}  # driver -> {'created', 'pages', 'authenticated', 'cookies_version'}
+        self._total = 0  # live drivers plus drivers being started
+        self._cookies = None
+        self._cookies_version = 0
+        self._closed = False
+        self._available = Condition(Lock())
+
+    def acquire(self, timeout=DRIVER_ACQUIRE_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            driver = None
+            with self._available:
+                while not self._idle and self._total >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._available.wait(remaining):
+                        raise TimeoutError("No pooled driver became available")
+                if self._idle:
+                    driver = self._idle.pop()
+                else:
+                    self._total += 1
+
+            if driver is None:
+                try:
+                    driver = self._start_driver()
+                except Exception:
+                    with self._available:
+                        self._total -= 1
+                        self._available.notify()
+                    raise
+                return driver
+
+            if self._is_healthy(driver):
+                self.refresh(driver)
+                return driver
+            self.discard(driver)
+
+    def release(self, driver, pages=0):
+        with self._available:
+            meta = self._meta.get(driver)
+            if meta is None:
+                return
+            meta['pages'] += pages
+            if not self._closed and not self._over_budget(meta):
+                self._idle.append(driver)
+                self._available.notify()
+                return
+        self.discard(driver)
+
+    def discard(self, driver):
+        with self._available:
+            if self._meta.pop(driver, None) is None:
+                return
+            self._total -= 1
+            self._available.notify()
+        forget_driver_state(driver)
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.info(f"Error quitting pooled driver: {e}")
+
+    def is_authenticated(self, driver):
+        with self._available:
+            meta = self._meta.get(driver)
+            return bool(meta and meta['authenticated'])
+
+    def install_cookies(self, cookies):
+        # Pooled drivers pick up the new cookies the next time they are handed out
+        with self._available:
+            self._cookies = cookies
+            self._cookies_version += 1
+
+    def refresh(self, driver):
+        with self._available:
+            meta = self._meta.get(driver)
+            if meta is None or meta['cookies_version'] >= self._cookies_version:
+                return
+            cookies = self._cookies
+            version = self._cookies_version
+        apply_cookies(driver, cookies)
+        with self._available:
+            meta['authenticated'] = True
+            meta['cookies_version'] = version
+
+    def shutdown(self, in_use=False):
+        # Borrowed drivers are quit when they come back, unless in_use says not to wait for them
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            borrowed = [driver for driver in self._meta if driver not in idle] if in_use else []
+        for driver in idle + borrowed:
+            self.discard(driver)
+
+    def _start_driver(self):
+        with self._available:
+            version = self._cookies_version
+        driver = initialize_driver(self.download_dir, headless=True, network_log=self.network_log)
+        authenticated = self.authenticate and load_session_cookies(driver, self.cookie_file_path)
+        with self._available:
+            self._meta[driver] = {
+                'created': time.monotonic(),
+                'pages': 0,
+                'authenticated': authenticated,
+                'cookies_version': version if authenticated else 0,
+            }
+        self.refresh(driver)
+        return driver
+
+    def _over_budget(self, meta):
+        return (meta['pages'] >= self.max_pages
+                or time.monotonic() - meta['created'] >= self.max_age)
+
+    def _is_healthy(self, driver):
+        with self._available:
+            meta = self._meta.get(driver)
+            if meta is None or self._over_budget(meta):
+                return False
+        try:
+            driver.execute_script('return 1')
+            if 'login' in driver.current_url:
+                with self._available:
+                    meta['authenticated'] = False
+            return True
+        except Exception as e:
+            logging.info(f"Pooled driver failed health check: {e}")
+            return False
+
+
+DRIVER_POOL = DriverPool(DRIVER_POOL_SIZE, DRIVER_MAX_PAGES, DRIVER_MAX_AGE, DOWNLOAD_DIR, COOKIE_FILE_PATH)
+atexit.register(DRIVER_POOL.shutdown)
+
+# Unauthenticated drivers that only turn fetched invoice HTML into PDFs
+RENDERER_POOL = DriverPool(RENDERER_POOL_SIZE, DRIVER_MAX_PAGES, DRIVER_MAX_AGE, DOWNLOAD_DIR, COOKIE_FILE_PATH,
+                           authenticate=False, network_log=False)
+atexit.register(RENDERER_POOL.shutdown)
+
+
+class InvoiceCache:
+    """SQLite index of rendered invoices plus content-addressed PDF files."""
+
+    def __init__(self, directory, ttl, links_ttl, max_bytes):
+        self.directory = directory
+        self.files_dir = os.path.join(directory, 'files')
+        self.db_path = os.path.join(directory, 'cache.sqlite3')
+        self.ttl = ttl
+        self.links_ttl = links_ttl
+        self.max_bytes = max_bytes
+        self._total_bytes = None  # size of the cached files as of the last sweep plus what was stored since
+        self._next_sweep = 0
+        self._db = None
+        self._lock = Lock()
+
+    def lookup(self, booking_number, href):
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT path FROM invoices WHERE booking_number = ? AND href = ? AND created > ?",
+                (booking_number, href, time.time() - self.ttl),
+            ).fetchone()
+            if row is None or not os.path.isfile(row[0]):
+                return None
+            db.execute(
+                "UPDATE invoices SET last_used = ? WHERE booking_number = ? AND href = ?",
+                (time.time(), booking_number, href),
+            )
+            db.commit()
+            return row[0]
+
+    def lookup_booking(self, booking_number):
+        # Cached paths in link order, or None unless every invoice of the booking is cached
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT hrefs FROM bookings WHERE booking_number = ? AND discovered > ?",
+                (booking_number, time.time() - self.links_ttl),
+            ).fetchone()
+        if row is None:
+            return None
+        paths = []
+        for href in json.loads(row[0]):
+            path = self.lookup(booking_number, href)
+            if path is None:
+                return None
+            paths.append(path)
+        return paths
+
+    def store(self, booking_number, href, data):
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.files_dir, f"{content_hash}.pdf")
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            if not os.path.isfile(path):
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(path + '.tmp', path)
+                if self._total_bytes is not None:
+                    self._total_bytes += os.path.getsize(path)
+            db.execute(
+                "INSERT OR REPLACE INTO invoices (booking_number, href, content_hash, path, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (booking_number, href, content_hash, path, os.path.getsize(path), now, now),
+            )
+            db.commit()
+            # Sweeping scans the whole index, so it only runs when a bound may have been crossed.
+            # Files other processes add are only counted from the next sweep on.
+            if self._total_bytes is None or self._total_bytes > self.max_bytes or now >= self._next_sweep:
+                self._evict(db)
+        return path
+
+    def store_booking(self, booking_number, hrefs):
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO bookings (booking_number, hrefs, discovered) VALUES (?, ?, ?)",
+                (booking_number, json.dumps(hrefs), time.time()),
+            )
+            db.commit()
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(self.files_dir, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS invoices (booking_number TEXT, href TEXT, content_hash TEXT, "
+                "path TEXT, size INTEGER, created REAL, last_used REAL, PRIMARY KEY (booking_number, href))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS invoices_path ON invoices (path)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS bookings (booking_number TEXT PRIMARY KEY, hrefs TEXT, discovered REAL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _evict(self, db):
+        # Expired entries go first, then whole files in least-recently-used order until a tenth under the
+        # size cap, so the next few stores do not sweep again. Only files that lost their last entry are removed.
+        now = time.time()
+        expired = now - self.ttl
+        freed = {row[0] for row in db.execute("SELECT DISTINCT path FROM invoices WHERE created <= ?", (expired,))}
+        db.execute("DELETE FROM invoices WHERE created <= ?", (expired,))
+        db.execute("DELETE FROM bookings WHERE discovered <= ?", (now - self.links_ttl,))
+        files = db.execute(
+            "SELECT content_hash, path, MAX(size) FROM invoices GROUP BY content_hash ORDER BY MAX(last_used)"
+        ).fetchall()
+        total = sum(size for _, _, size in files)
+        for content_hash, path, size in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            db.execute("DELETE FROM invoices WHERE content_hash = ?", (content_hash,))
+            freed.add(path)
+            total -= size
+        db.commit()
+        self._total_bytes = total
+        self._next_sweep = now + INVOICE_CACHE_SWEEP_INTERVAL
+
+        for path in freed:
+            # Identical PDFs are shared, so a file may still back another entry
+            if db.execute("SELECT 1 FROM invoices WHERE path = ? LIMIT 1", (path,)).fetchone():
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.info(f"Could not remove cached invoice {path}: {e}")
+
+
+INVOICE_CACHE = None
+if INVOICE_CACHE_ENABLED:
+    INVOICE_CACHE = InvoiceCache(INVOICE_CACHE_DIR, INVOICE_CACHE_TTL, INVOICE_LINKS_TTL, INVOICE_CACHE_MAX_BYTES)
+
+
+# Readiness probes run inside the page through execute_async_script. Selenium's
+# execute_cdp_cmd cannot subscribe to CDP events such as Page.loadEventFired, so the
+# page resolves these promises itself (load event, MutationObserver, PerformanceObserver)
+# and the WebDriver call returns the moment the condition holds.
+WAIT_FOR_LOAD_JS = """
+const [timeoutMs, done] = arguments;
+if (document.readyState === 'complete') { done(true); return; }
+const timer = setTimeout(() => done(false), timeoutMs);
+window.addEventListener('load', () => { clearTimeout(timer); done(true); }, {once: true});
+"""
+
+# Settled means no DOM mutations and no finished network requests for quietMs
+WAIT_FOR_SETTLE_JS = """
+const [quietMs, timeoutMs, done] = arguments;
+let last = performance.now();
+const bump = () => { last = performance.now(); };
+const mutations = new MutationObserver(bump);
+mutations.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+const resources = new PerformanceObserver(bump);
+resources.observe({type: 'resource'});
+const started = performance.now();
+const finish = (settled) => { mutations.disconnect(); resources.disconnect(); clearInterval(timer); done(settled); };
+const timer = setInterval(() => {
+    const now = performance.now();
+    if (now - last >= quietMs) finish(true);
+    else if (now - started >= timeoutMs) finish(false);
+}, 50);
+"""
+
+# Scrolls to the bottom to trigger lazy loading, waits for the page to settle, scrolls back
+# and returns every invoice link (deduplicated, in document order) with its metadata
+COLLECT_INVOICE_LINKS_JS = """
+const [xpath, quietMs, timeoutMs, done] = arguments;
+const collect = () => {
+    const result = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const links = [];
+    const seen = new Set();
+    for (let i = 0; i < result.snapshotLength; i++) {
+        const a = result.snapshotItem(i);
+        if (!a.href || seen.has(a.href)) continue;
+        seen.add(a.href);
+        const match = a.href.match(/\\/vat_invoices\\/([^/?#]+)/);
+        links.push({
+            href: a.href,
+            invoice_id: match ? match[1] : null,
+            text: (a.innerText || '').trim(),
+            index: links.length,
+        });
+    }
+    return links;
+};
+let last = performance.now();
+const bump = () => { last = performance.now(); };
+const mutations = new MutationObserver(bump);
+mutations.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+const resources = new PerformanceObserver(bump);
+resources.observe({type: 'resource'});
+window.scrollTo(0, document.body.scrollHeight);
+const started = performance.now();
+const timer = setInterval(() => {
+    const now = performance.now();
+    if (now - last < quietMs && now - started < timeoutMs) return;
+    clearInterval(timer);
+    mutations.disconnect();
+    resources.disconnect();
+    window.scrollTo(0, 0);
+    done(collect());
+}, 50);
+"""
+
+# Routes the already-loaded reservations app to another confirmation code without a reload.
+# Resolves true once the new booking is rendered and the previous one is gone.
+SPA_NAVIGATE_JS = """
+const [url, code, previousCode, timeoutMs, done] = arguments;
+if (!location.pathname.startsWith('/hosting/reservations')) { done(false); return; }
+const target = new URL(url, location.href);
+const path = target.pathname + target.search;
+try {
+    if (window.next && window.next.router && window.next.router.push) {
+        window.next.router.push(path);
+    } else {
+        // Client-side routers listen for popstate; pushState alone does not notify them
+        history.pushState(history.state, '', path);
+        window.dispatchEvent(new PopStateEvent('popstate', {state: history.state}));
+    }
+} catch (e) { done(false); return; }
+const switched = () => {
+    const text = document.body ? document.body.innerText : '';
+    return location.search.includes(code) && text.includes(code) && !text.includes(previousCode);
+};
+if (switched()) { done(true); return; }
+const observer = new MutationObserver(() => {
+    if (switched()) { observer.disconnect(); clearTimeout(timer); done(true); }
+});
+observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+const timer = setTimeout(() => { observer.disconnect(); done(switched()); }, timeoutMs);
+"""
+
+# Classifies a freshly opened booking page as soon as its state is known: 'invoices' once a
+# link renders, 'login' on a sign-in page, and once the page has been quiet for quietMs either
+# 'no_invoices' (the booking is shown without links) or 'not_found' (the code is not on the page)
+BOOKING_STATE_JS = """
+const [xpath, code, quietMs, timeoutMs, done] = arguments;
+const hasLinks = () => document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue !== null;
+const onLogin = () => location.pathname.includes('/login') || !!document.querySelector('input[type=password]');
+let last = performance.now();
+const started = last;
+const bump = () => { last = performance.now(); };
+const mutations = new MutationObserver(bump);
+mutations.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+const resources = new PerformanceObserver(bump);
+resources.observe({type: 'resource'});
+const check = () => {
+    if (hasLinks()) return 'invoices';
+    if (onLogin()) return 'login';
+    const now = performance.now();
+    if (now - last >= quietMs) {
+        const text = document.body ? document.body.innerText : '';
+        return text.includes(code) ? 'no_invoices' : 'not_found';
+    }
+    return now - started >= timeoutMs ? 'timeout' : null;
+};
+const timer = setInterval(() => {
+    const state = check();
+    if (state === null) return;
+    clearInterval(timer);
+    mutations.disconnect();
+    resources.disconnect();
+    done(state);
+}, 50);
+"""
+
+
+def wait_for_load(driver, timeout):
+    return bool(driver.execute_async_script(WAIT_FOR_LOAD_JS, int(timeout * 1000)))
+
+
+def wait_for_settle(driver, timeout, quiet_ms=SETTLE_QUIET_MS):
+    return bool(driver.execute_async_script(WAIT_FOR_SETTLE_JS, quiet_ms, int(timeout * 1000)))
+
+
+def collect_invoice_links(driver, settle_timeout, quiet_ms=SETTLE_QUIET_MS):
+    return driver.execute_async_script(
+        COLLECT_INVOICE_LINKS_JS, INVOICE_LINK_XPATH, quiet_ms, int(settle_timeout * 1000)
+    ) or []
+
+
+# Optimized print options for faster PDF generation
+PRINT_OPTIONS = {
+    "printBackground": False,  # Disabled for faster rendering
+    "pageRanges": "1",
+    "paperWidth": 8.27,
+    "paperHeight": 11.69,
+    "marginTop": 0,
+    "marginBottom": 0,
+    "marginLeft": 0,
+    "marginRight": 0,
+    "preferCSSPageSize": False,  # Disabled for faster processing
+    "displayHeaderFooter": False,  # Disabled for faster processing
+    "scale": 0.8  # Smaller scale for faster processing
+}
+
+
+def write_pdf(driver, sink):
+    # Ask Chrome for a stream handle so the PDF never sits in one base64 reply
+    pdf = driver.execute_cdp_cmd("Page.printToPDF", dict(PRINT_OPTIONS, transferMode="ReturnAsStream"))
+    handle = pdf.get('stream')
+    if handle is None:
+        # Older Chrome versions ignore transferMode and return the data inline
+        sink.write(base64.b64decode(pdf['data']))
+        return
 
     try:
-        booking_url = f"https://www.airbnb.com/hosting/reservations/all?confirmationCode={booking_number}"
-        driver.get(booking_url)
+        pending = ''
+        while True:
+            chunk = driver.execute_cdp_cmd("IO.read", {'handle': handle, 'size': PDF_CHUNK_SIZE})
+            data = chunk.get('data', '')
+            if chunk.get('base64Encoded'):
+                # Decode whole base64 quanta only and carry the remainder into the next chunk
+                data = pending + data
+                usable = len(data) - len(data) % 4
+                sink.write(base64.b64decode(data[:usable]))
+                pending = data[usable:]
+            elif data:
+                sink.write(data.encode('utf-8'))
+            if chunk.get('eof'):
+                break
+        if pending:
+            sink.write(base64.b64decode(pending))
+    finally:
+        driver.execute_cdp_cmd("IO.close", {'handle': handle})
 
-        # Reduced wait time for page load (still safe, just faster)
-        WebDriverWait(driver, 20).until(lambda d: d.execute_script('return document.readyState') == 'complete')
 
-        # Reduced wait time for invoice links
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_all_elements_located((By.XPATH, "//a[contains(@href, '/vat_invoices/')]"))
+def build_http_session(cookie_file_path, user_agent=None, limiter=None):
+    # Reuse the cookies saved by save_session_cookies for plain HTTP invoice fetches
+    http_session = requests.Session()
+    if limiter is not None:
+        adapter = RateLimitedAdapter(limiter, pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    else:
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    http_session.mount('https://', adapter)
+    http_session.mount('http://', adapter)
+    if user_agent:
+        # Present the same browser the cookies were issued to
+        http_session.headers['User-Agent'] = user_agent.replace('HeadlessChrome', 'Chrome')
+    http_session.headers['Accept'] = 'text/html,application/xhtml+xml'
+    load_http_cookies(http_session, cookie_file_path)
+    return http_session
+
+
+def load_http_cookies(http_session, cookie_file_path):
+    with open(cookie_file_path, 'r') as f:
+        cookies = json.load(f)
+    http_session.cookies.clear()
+    for cookie in cookies:
+        http_session.cookies.set(
+            cookie.get('name'),
+            cookie.get('value'),
+            domain=cookie.get('domain'),
+            path=cookie.get('path', '/'),
+            secure=cookie.get('secure', False),
         )
 
-        # Optimized lazy loading trigger - faster scrolling
+
+def fetch_invoice_html(http_session, href):
+    response = http_session.get(href, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    if 'login' in response.url:
+        raise DownloadFailure(OUTCOME_SESSION_EXPIRED, f"Invoice request was redirected to login: {href}")
+    return response.text, response.url
+
+
+def render_html_to_pdf(renderer, html, base_url, sink):
+    # Resolve the invoice's relative stylesheets and scripts against the page it came from
+    base_tag = f'<base href="{base_url}">'
+    if '<head>' in html:
+        html = html.replace('<head>', '<head>' + base_tag, 1)
+    else:
+        html = base_tag + html
+
+    frame_id = renderer.execute_cdp_cmd("Page.getFrameTree", {})['frameTree']['frame']['id']
+    renderer.execute_cdp_cmd("Page.setDocumentContent", {'frameId': frame_id, 'html': html})
+    wait_for_load(renderer, 10)
+    wait_for_settle(renderer, 5)
+    write_pdf(renderer, sink)
+
+
+def download_invoices_over_http(http_session, invoices):
+    def fetch_and_render(href, sink):
+        html, final_url = fetch_invoice_html(http_session, href)
+        renderer = RENDERER_POOL.acquire()
         try:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(0.5)  # Reduced from 1 second
-            driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(0.5)  # Reduced from 1 second
+            render_html_to_pdf(renderer, html, final_url, sink)
         except Exception:
-            pass
+            RENDERER_POOL.discard(renderer)
+            raise
+        RENDERER_POOL.release(renderer, pages=1)
+
+    # Fetches run concurrently; rendering is bounded by the renderer pool size
+    with ThreadPoolExecutor(max_workers=HTTP_FETCH_WORKERS) as executor:
+        futures = [executor.submit(fetch_and_render, href, sink) for href, sink in invoices]
+        for future in futures:
+            future.result()
+
+
+def driver_state(driver):
+    with DRIVER_STATE_LOCK:
+        return DRIVER_STATE.setdefault(driver.session_id, {})
+
 
-        # Re-evaluate links after potential lazy load
-        download_links = driver.find_elements(By.XPATH, "//a[contains(@href, '/vat_invoices/')]")
-        logging.info(f"Found {len(download_links)} invoice link(s) for booking {booking_number}")
+def forget_driver_state(driver):
+    with DRIVER_STATE_LOCK:
+        DRIVER_STATE.pop(driver.session_id, None)
 
-        if not download_links:
-            logging.info(f"No invoice links found for booking number {booking_number}")
-            return True, downloaded_file_paths
 
-        for link_index in range(len(download_links)):
-            link_xpath = f"(//a[contains(@href, '/vat_invoices/')])[{link_index+1}]"
-            WebDriverWait(driver, 20).until(  # Reduced from 40 seconds
-                EC.element_to_be_clickable((By.XPATH, link_xpath))
+def get_print_target(driver):
+    # One long-lived background tab per driver that invoices are navigated into and printed
+    state = driver_state(driver)
+    if 'print_handle' in state:
+        return state['main_handle'], state['print_handle']
+
+    main_handle = driver.current_window_handle
+    target = driver.execute_cdp_cmd("Target.createTarget", {'url': 'about:blank', 'background': True})
+    # chromedriver uses CDP target ids as window handles
+    print_handle = target['targetId']
+    # URL blocking is per target, so the new tab needs its own
+    driver.switch_to.window(print_handle)
+    try:
+        apply_request_blocking(driver)
+    finally:
+        driver.switch_to.window(main_handle)
+    state['main_handle'] = main_handle
+    state['print_handle'] = print_handle
+    return main_handle, print_handle
+
+
+def forget_print_target(driver):
+    state = driver_state(driver)
+    state.pop('main_handle', None)
+    state.pop('print_handle', None)
+
+
+def print_invoice(driver, href, sink):
+    main_handle, print_handle = get_print_target(driver)
+    try:
+        driver.switch_to.window(print_handle)
+    except NoSuchWindowException:
+        # The background tab went away; make a fresh one on the next attempt
+        forget_print_target(driver)
+        raise
+    try:
+        with rate_limited(driver):
+            driver.get(href)
+        if not wait_for_load(driver, 10):
+            raise TimeoutException(f"Invoice page did not finish loading: {href}")
+        write_pdf(driver, sink)
+    finally:
+        driver.switch_to.window(main_handle)
+
+
+def navigate_to_booking(driver, booking_number):
+    booking_url = f"https://www.airbnb.com/hosting/reservations/all?confirmationCode={booking_number}"
+    state = driver_state(driver)
+    previous_booking = state.pop('booking', None)
+
+    # Switching in place is only safe when we know which booking the page showed last,
+    # so its content can be told apart from the new one
+    if SPA_NAVIGATION and previous_booking and state.get('spa_failures', 0) < SPA_MAX_FAILURES:
+        with rate_limited(driver):
+            switched = driver.execute_async_script(
+                SPA_NAVIGATE_JS, booking_url, booking_number, previous_booking, SPA_NAVIGATION_TIMEOUT * 1000
             )
-            link_el = driver.find_element(By.XPATH, link_xpath)
-            
-            # Optimized scrolling and clicking
-            try:
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", link_el)
-                time.sleep(0.2)  # Minimal delay for scroll
-            except Exception:
-                pass
-            
-            try:
-                driver.execute_script("arguments[0].click();", link_el)
-            except Exception:
-                link_el.click()
-
-            # Reduced wait for new tab
-            WebDriverWait(driver, 10).until(lambda d: len(d.window_handles) > 1)  # Reduced from 20
-            driver.switch_to.window(driver.window_handles[-1])
-
-            # Reduced wait for page load
-            WebDriverWait(driver, 10).until(lambda d: d.execute_script('return document.readyState') == 'complete')  # Reduced from 20
-
-            # Optimized print options for faster PDF generation
-            print_options = {
-                "printBackground": False,  # Disabled for faster rendering
-                "pageRanges": "1",
-                "paperWidth": 8.27,
-                "paperHeight": 11.69,
-                "marginTop": 0,
-                "marginBottom": 0,
-                "marginLeft": 0,
-                "marginRight": 0,
-                "preferCSSPageSize": False,  # Disabled for faster processing
-                "displayHeaderFooter": False,  # Disabled for faster processing
-                "scale": 0.8  # Smaller scale for faster processing
-            }
+        if switched:
+            state['spa_failures'] = 0
+            state['booking'] = booking_number
+            return True
+        state['spa_failures'] = state.get('spa_failures', 0) + 1
+        logging.info(f"In-place navigation to booking {booking_number} failed, reloading the page")
+
+    # driver.get returns after the load event, so only the SPA content needs waiting for
+    with rate_limited(driver):
+        driver.get(booking_url)
+    state['booking'] = booking_number
+    return False
+
+
+def extract_invoice_hrefs(body):
+    # API payloads escape slashes and ampersands inside JSON strings
+    body = body.replace('\\/', '/').replace('\\u0026', '&').replace('\\u003d', '=')
+    return [urljoin("https://www.airbnb.com/", path) for path in INVOICE_PATH_RE.findall(body)]
+
 
-            # Execute the print command
-            pdf = driver.execute_cdp_cmd("Page.printToPDF", print_options)
+def booking_invoice_hrefs(payload, booking_number):
+    # Invoice links inside the JSON objects whose confirmation code is this booking's;
+    # everything else in the payload (e.g. the rest of a reservation list) is ignored
+    if isinstance(payload, dict):
+        if any(payload.get(key) == booking_number for key in BOOKING_CODE_KEYS):
+            return extract_invoice_hrefs(json.dumps(payload))
+        children = payload.values()
+    elif isinstance(payload, list):
+        children = payload
+    else:
+        return []
+    hrefs = []
+    for child in children:
+        hrefs.extend(booking_invoice_hrefs(child, booking_number))
+    return hrefs
+
+
+def capture_invoice_links(driver, booking_number, timeout):
+    # Read vat_invoices references out of the JSON responses the reservations app fetched
+    deadline = time.monotonic() + timeout
+    loading = {}  # requestId -> url of JSON responses that have not finished loading
+    hrefs = []
+    while True:
+        # Waiting for the page to settle paces the loop without a fixed sleep
+        settled = wait_for_settle(driver, 2)
+        for event in drain_network_events(driver):
+            params = event.get('params', {})
+            if event['method'] == 'Network.responseReceived':
+                response = params.get('response', {})
+                if 'json' in response.get('mimeType', '') and 'airbnb.' in response.get('url', ''):
+                    loading[params['requestId']] = response['url']
+            elif event['method'] == 'Network.loadingFinished' and params.get('requestId') in loading:
+                url = loading.pop(params['requestId'])
+                try:
+                    body = driver.execute_cdp_cmd("Network.getResponseBody", {'requestId': params['requestId']})
+                except Exception as e:
+                    logging.info(f"Could not read response body for {url}: {e}")
+                    continue
+                text = body.get('body', '')
+                if body.get('base64Encoded'):
+                    text = base64.b64decode(text).decode('utf-8', errors='replace')
+                try:
+                    payload = json.loads(text)
+                except ValueError:
+                    continue
+                hrefs.extend(booking_invoice_hrefs(payload, booking_number))
+        if (settled and not loading) or time.monotonic() >= deadline:
+            break
+
+    links = []
+    for href in dict.fromkeys(hrefs):
+        invoice_id = urlparse(href).path.rstrip('/').rsplit('/', 1)[-1]
+        links.append({'href': href, 'invoice_id': invoice_id, 'text': '', 'index': len(links)})
+    return links
+
+
+class DownloadFailure(Exception):
+    """A download attempt that ended in a known, classified outcome."""
+
+    def __init__(self, outcome, message):
+        super().__init__(message)
+        self.outcome = outcome
+
+
+def detect_booking_state(driver, booking_number, timeout):
+    state = driver.execute_async_script(
+        BOOKING_STATE_JS, INVOICE_LINK_XPATH, booking_number, BOOKING_STATE_QUIET_MS, int(timeout * 1000)
+    )
+    if state == 'login':
+        raise DownloadFailure(OUTCOME_SESSION_EXPIRED, f"Session expired while opening booking {booking_number}")
+    if state == 'not_found':
+        raise DownloadFailure(OUTCOME_NOT_FOUND, f"Booking {booking_number} was not found")
+    if state == 'no_invoices':
+        raise DownloadFailure(OUTCOME_NO_INVOICES, f"Booking {booking_number} has no VAT invoices")
+    if state != 'invoices':
+        raise DownloadFailure(OUTCOME_TRANSIENT, f"Booking {booking_number} did not finish rendering")
+
+
+def render_invoices(driver, http_session, invoices):
+    try:
+        if http_session is not None:
+            # Fetch the invoices directly; the browser is only needed to find the links
+            download_invoices_over_http(http_session, invoices)
+        else:
+            # Print each invoice in the driver's background tab; the reservation tab stays put
+            for href, sink in invoices:
+                print_invoice(driver, href, sink)
+    except DownloadFailure:
+        raise
+    except Exception as e:
+        raise DownloadFailure(OUTCOME_RENDER_FAILED, f"Rendering invoices failed: {e!r}") from e
 
-            # Decode the result
-            pdf_content = base64.b64decode(pdf['data'])
 
-            # Save the PDF to a file
-            file_path = os.path.join(download_dir, f"invoice_{booking_number}_{link_index+1}.pdf")
-            with open(file_path, 'wb') as file:
-                file.write(pdf_content)
-            downloaded_file_paths.append(file_path)
+def invoice_name(booking_number, link_index):
+    return f"invoice_{booking_number}_{link_index+1}.pdf"
+
+
+def archive_invoices(archive, booking_number, sources):
+    # Every cached file is opened before anything is written, so a file evicted meanwhile fails the
+    # booking before any of its members reach the archive; an open file stays readable once unlinked
+    files = []
+    try:
+        for source in sources:
+            files.append(source if isinstance(source, io.BytesIO) else open(source, 'rb'))
+        names = []
+        for link_index, source in enumerate(files):
+            name = invoice_name(booking_number, link_index)
+            if isinstance(source, io.BytesIO):
+                with source.getbuffer() as data:
+                    archive.add(name, data)
+            else:
+                archive.add_file(name, source)
+            names.append(name)
+        return names
+    finally:
+        for source in files:
+            source.close()
+
 
-            # Close the new tab and switch back to the original tab
-            driver.close()
-            driver.switch_to.window(driver.window_handles[0])
+def download_invoice(driver, booking_number, download_dir, archive, http_session=None, force_refresh=False):
+    # Invoices go straight into the job's archive; only a fully downloaded booking is added
+    downloaded_names = []
+    logging.info(f"Starting download for booking number {booking_number}")
 
-            # Reduced delay between downloads (still respectful to Airbnb)
-            time.sleep(1)  # Reduced from 2 seconds
-            # Reduced wait for window handles
-            WebDriverWait(driver, 5).until(lambda d: len(d.window_handles) >= 1)  # Reduced from 20
+    try:
+        # A booking whose invoices are all cached and whose link list was read recently needs no page load
+        if INVOICE_CACHE is not None and not force_refresh:
+            cached_paths = INVOICE_CACHE.lookup_booking(booking_number)
+            if cached_paths is not None:
+                downloaded_names = archive_invoices(archive, booking_number, cached_paths)
+                logging.info(f"Served {len(cached_paths)} cached invoice(s) for booking {booking_number}")
+                return OUTCOME_OK, downloaded_names
+
+        if INVOICE_DISCOVERY != 'dom':
+            # Only responses fetched for this booking should be inspected
+            drain_network_events(driver)
+        switched_in_place = navigate_to_booking(driver, booking_number)
+
+        invoice_links = []
+        if INVOICE_DISCOVERY != 'dom':
+            invoice_links = capture_invoice_links(driver, booking_number, 20)
+
+        if not invoice_links and INVOICE_DISCOVERY == 'network' and switched_in_place:
+            # The app may have answered an in-place switch from its own cache; the retry does a
+            # full page load, which fetches afresh
+            raise DownloadFailure(OUTCOME_TRANSIENT, f"No invoice data captured for booking {booking_number}")
+
+        if not invoice_links:
+            # Resolves as soon as invoice links render, or early when the page shows a login
+            # form, no such booking, or a booking without invoices. In network mode this
+            # classifies bookings whose full page load captured nothing.
+            detect_booking_state(driver, booking_number, 20)
+
+            # Lazy-load, settle and read every invoice link in a single roundtrip
+            invoice_links = collect_invoice_links(driver, 3)
+        logging.info(f"Found {len(invoice_links)} invoice link(s) for booking {booking_number}")
+
+        if not invoice_links:
+            if 'login' in driver.current_url:
+                raise DownloadFailure(OUTCOME_SESSION_EXPIRED, f"Session expired while opening booking {booking_number}")
+            raise DownloadFailure(OUTCOME_NO_INVOICES, f"No invoice links found for booking {booking_number}")
+
+        hrefs = [link['href'] for link in invoice_links]
+
+        # Reuse invoices rendered by earlier jobs and render the rest into memory
+        sources = []  # cached path or in-memory sink per invoice, in link order
+        pending = []
+        for href in hrefs:
+            cached_path = None
+            if INVOICE_CACHE is not None and not force_refresh:
+                cached_path = INVOICE_CACHE.lookup(booking_number, href)
+            if cached_path:
+                sources.append(cached_path)
+            else:
+                sink = io.BytesIO()
+                sources.append(sink)
+                pending.append((href, sink))
+        if len(pending) < len(hrefs):
+            logging.info(f"Reused {len(hrefs) - len(pending)} cached invoice(s) for booking {booking_number}")
+
+        render_invoices(driver, http_session, pending)
+
+        # Each PDF is copied out of memory once: into the cache, or straight into the archive.
+        # getbuffer() views the sink without duplicating it, and each sink is freed once written.
+        if INVOICE_CACHE is not None:
+            for position, source in enumerate(sources):
+                if isinstance(source, io.BytesIO):
+                    with source.getbuffer() as data:
+                        sources[position] = INVOICE_CACHE.store(booking_number, hrefs[position], data)
+                    source.close()
+            INVOICE_CACHE.store_booking(booking_number, hrefs)
+
+        downloaded_names = archive_invoices(archive, booking_number, sources)
 
         logging.info(f"Successfully downloaded invoices for booking {booking_number}")
-        return True, downloaded_file_paths
+        return OUTCOME_OK, downloaded_names
+
+    except DownloadFailure as e:
+        if e.outcome in RETRYABLE_OUTCOMES or e.outcome == OUTCOME_SESSION_EXPIRED:
+            # Whatever the page shows now is unknown, so the next attempt does a full load
+            driver_state(driver).pop('booking', None)
+        logging.info(f"{e} ({e.outcome})")
+        return e.outcome, downloaded_names
     
     except Exception as e:
+        # Whatever the page shows now is unknown, so the next attempt does a full load
+        driver_state(driver).pop('booking', None)
         # Capture more context and a screenshot to aid debugging
         try:
             timestamp = int(time.time())
@@ -313,142 +1515,658 @@ def download_invoice(driver, booking_number, download_dir):
             f"url={getattr(driver, 'current_url', 'n/a')} | title={getattr(driver, 'title', 'n/a')} | "
             f"screenshot={screenshot_path}"
         )
-        return False, downloaded_file_paths
+        return OUTCOME_TRANSIENT, downloaded_names
     
     
 
 
 
-def zip_invoices(invoice_paths, download_dir):
-    zip_path = os.path.join(download_dir, 'invoices.zip')
-    with zipfile.ZipFile(zip_path, 'w') as zipf:
-        for file_path in invoice_paths:
-            zipf.write(file_path, os.path.basename(file_path))
-    return zip_path
-
+def archive_name(job_id):
+    return f"invoices_{job_id}.zip"
+
+
+class InvoiceArchive:
+    """ZIP archive a job appends invoices to as they finish; closing it writes the central directory.
+
+    A name that is already in the archive is skipped, so a retried booking never duplicates members.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []  # ZipInfo of every member whose bytes are on disk, in archive order
+        self.closed = False
+        self._names = set()
+        self._zip = zipfile.ZipFile(path, 'w')
+        self._condition = Condition()
+
+    def add(self, name, data):
+        with self._condition:
+            if name in self._names:
+                return
+            self._zip.writestr(zipfile.ZipInfo(name, time.localtime()[:6]), data)
+            self._published()
+
+    def add_file(self, name, source):
+        # Copies an open file in chunks
+        with self._condition:
+            if name in self._names:
+                return
+            with self._zip.open(zipfile.ZipInfo(name, time.localtime()[:6]), 'w') as member:
+                shutil.copyfileobj(source, member, PDF_CHUNK_SIZE)
+            self._published()
+
+    def close(self):
+        with self._condition:
+            self._zip.close()
+            self.closed = True
+            self._condition.notify_all()
+
+    def _published(self):
+        # Flush so followers reading the file see the new member
+        self._zip.fp.flush()
+        self.entries.append(self._zip.infolist()[-1])
+        self._names.add(self.entries[-1].filename)
+        self._condition.notify_all()
+
+    def follow(self, idle_timeout):
+        """Yield (name, data) for every member, waiting for new ones until the archive is closed.
+
+        Raises TimeoutError when nothing changes for idle_timeout seconds, so the response is cut off
+        instead of ending as a valid but incomplete ZIP.
+        """
+        with open(self.path, 'rb') as archive_file:
+            index = 0
+            while True:
+                with self._condition:
+                    if not self._condition.wait_for(lambda: index < len(self.entries) or self.closed, idle_timeout):
+                        raise TimeoutError(f"No invoice was added to {self.path} for {idle_timeout}s")
+                    if index == len(self.entries):
+                        return
+                    info = self.entries[index]
+                index += 1
+                # Members are stored uncompressed right after their local header
+                archive_file.seek(info.header_offset)
+                header = archive_file.read(30)
+                name_length, extra_length = struct.unpack('<HH', header[26:30])
+                archive_file.seek(info.header_offset + 30 + name_length + extra_length)
+                yield info.filename, archive_file.read(info.compress_size)
+
+
+def stream_zip(members):
+    """Write a ZIP on the fly: data descriptors carry each member's CRC and size after its data."""
+    offset = 0
+    central_directory = []
+    dos_time = time.localtime()
+    mod_time = (dos_time.tm_hour << 11) | (dos_time.tm_min << 5) | (dos_time.tm_sec // 2)
+    mod_date = ((dos_time.tm_year - 1980) << 9) | (dos_time.tm_mon << 5) | dos_time.tm_mday
+    for name, data in members:
+        encoded_name = name.encode('utf-8')
+        flags = 0x08 | 0x800  # sizes follow the data, UTF-8 names
+        crc = zlib.crc32(data)
+        header = struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, 20, flags, 0, mod_time, mod_date, 0, 0, 0, len(encoded_name), 0
+        )
+        yield header + encoded_name
+        yield data
+        yield struct.pack('<IIII', 0x08074b50, crc, len(data), len(data))
+        central_directory.append(struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014b50, 20, 20, flags, 0, mod_time, mod_date, crc, len(data), len(data),
+            len(encoded_name), 0, 0, 0, 0, 0, offset,
+        ) + encoded_name)
+        offset += len(header) + len(encoded_name) + len(data) + 16
+
+    directory = b''.join(central_directory)
+    yield directory
+    yield struct.pack(
+        '<IHHHHIIH', 0x06054b50, 0, 0, len(central_directory), len(central_directory), len(directory), offset, 0
+    )
+
+
+
+JOB_STATE_FIELDS = (
+    'total', 'current', 'done', 'status', 'stage', 'stage_progress', 'total_stages', 'queue_position',
+    'estimated_wait', 'network', 'failure_reasons', 'no_invoice_bookings', 'zip_path', 'report', 'error',
+    'streamable',
+)
+
+
+class JobState:
+    """Progress of one job. Writers hold its own condition; readers use the published snapshot."""
+
+    __slots__ = JOB_STATE_FIELDS + ('version', 'snapshot', 'finished_at', 'changed')
+
+    def __init__(self):
+        for name in JOB_STATE_FIELDS:
+            setattr(self, name, None)
+        self.version = 0
+        self.snapshot = {}
+        self.finished_at = None
+        self.changed = Condition()
+
+    def apply(self, fields, reset=False):
+        # Caller holds self.changed
+        if reset:
+            for name in JOB_STATE_FIELDS:
+                setattr(self, name, None)
+            self.finished_at = None
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.version += 1
+        # A fresh dict every time, so readers never see one being modified
+        self.snapshot = {name: getattr(self, name) for name in JOB_STATE_FIELDS if getattr(self, name) is not None}
+        if self.finished_at is None and (self.zip_path is not None or self.error is not None):
+            self.finished_at = time.monotonic()
+        self.changed.notify_all()
+
+
+class JobStateStore:
+    """In-memory job progress with per-job locking and TTL eviction of finished jobs."""
+
+    def __init__(self, ttl, max_jobs):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._states = {}
+        self._lock = Lock()  # guards membership only
+
+    def set(self, job_id, **fields):
+        # Replaces a job's fields; an existing record is reused so its watchers keep working
+        with self._lock:
+            state = self._states.get(job_id)
+            if state is None:
+                self._evict()
+                state = self._states[job_id] = JobState()
+        with state.changed:
+            state.apply(fields, reset=True)
+
+    def update(self, job_id, **fields):
+        state = self._states.get(job_id)
+        if state is None:
+            return
+        with state.changed:
+            state.apply(fields)
+
+    def get(self, job_id):
+        # No lock: snapshots are replaced, never modified, so treat the result as read-only
+        state = self._states.get(job_id)
+        return state.snapshot if state is not None else None
+
+    def wait(self, job_id, version, timeout):
+        """Return (version, snapshot) once the job differs from version or timeout passes."""
+        state = self._states.get(job_id)
+        if state is None:
+            return None, None
+        with state.changed:
+            state.changed.wait_for(lambda: state.version != version, timeout)
+            return state.version, state.snapshot
+
+    def _evict(self):
+        # Caller holds self._lock. Expired jobs go first, then the oldest finished ones over the bound.
+        now = time.monotonic()
+        finished = sorted(
+            (state.finished_at, job_id) for job_id, state in self._states.items() if state.finished_at is not None
+        )
+        excess = len(self._states) + 1 - self.max_jobs
+        for index, (finished_at, job_id) in enumerate(finished):
+            if index >= excess and now - finished_at < self.ttl:
+                break
+            del self._states[job_id]
+
+
+class SqliteJobStateStore:
+    """Job progress in a SQLite database (WAL mode) that every process on the machine can share."""
+
+    def __init__(self, path, ttl, max_jobs, poll_interval):
+        self.path = path
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+        self._db = None
+        self._lock = Lock()
+
+    def set(self, job_id, **fields):
+        self._write(job_id, fields, reset=True)
+
+    def update(self, job_id, **fields):
+        self._write(job_id, fields, reset=False)
+
+    def get(self, job_id):
+        row = self._read(job_id)
+        return json.loads(row[1]) if row is not None else None
+
+    def wait(self, job_id, version, timeout):
+        """Return (version, snapshot) once the job differs from version or timeout passes."""
+        # Other processes cannot notify us, so poll the row's version
+        deadline = time.monotonic() + timeout
+        while True:
+            row = self._read(job_id)
+            if row is None:
+                return None, None
+            if row[0] != version or time.monotonic() >= deadline:
+                return row[0], json.loads(row[1])
+            time.sleep(self.poll_interval)
+
+    def _read(self, job_id):
+        with self._lock:
+            return self._connect().execute(
+                "SELECT version, state FROM job_state WHERE job_id = ?", (job_id,)
+            ).fetchone()
+
+    def _write(self, job_id, fields, reset):
+        unknown = set(fields) - set(JOB_STATE_FIELDS)
+        if unknown:
+            raise AttributeError(f"Unknown job state field(s): {', '.join(sorted(unknown))}")
+        with self._lock:
+            db = self._connect()
+            # Take the write lock up front so concurrent updates from other processes serialize
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT version, state, finished FROM job_state WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                if row is None and not reset:
+                    db.execute("ROLLBACK")
+                    return
+                if row is None:
+                    self._evict(db)
+                version, state, finished = row if row is not None else (0, '{}', None)
+                state = {} if reset else json.loads(state)
+                if reset:
+                    finished = None
+                state.update(fields)
+                state = {name: value for name, value in state.items() if value is not None}
+                if finished is None and ('zip_path' in state or 'error' in state):
+                    finished = time.time()
+                db.execute(
+                    "INSERT OR REPLACE INTO job_state (job_id, version, state, finished) VALUES (?, ?, ?, ?)",
+                    (job_id, version + 1, json.dumps(state), finished),
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def _evict(self, db):
+        # Same policy as JobStateStore: expired finished jobs, then the oldest finished ones over the bound
+        db.execute("DELETE FROM job_state WHERE finished IS NOT NULL AND finished <= ?", (time.time() - self.ttl,))
+        count = db.execute("SELECT COUNT(*) FROM job_state").fetchone()[0]
+        excess = count + 1 - self.max_jobs
+        if excess > 0:
+            db.execute(
+                "DELETE FROM job_state WHERE job_id IN "
+                "(SELECT job_id FROM job_state WHERE finished IS NOT NULL ORDER BY finished LIMIT ?)",
+                (excess,),
+            )
 
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Autocommit mode; transactions are opened explicitly in _write
+            self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS job_state (job_id TEXT PRIMARY KEY, version INTEGER, state TEXT, finished REAL)"
+            )
+        return self._db
+
+
+if JOB_STATE_BACKEND == 'sqlite':
+    JOB_STATE = SqliteJobStateStore(JOB_STATE_DB, JOB_STATE_TTL, JOB_STATE_MAX_JOBS, JOB_STATE_POLL_INTERVAL)
+else:
+    JOB_STATE = JobStateStore(JOB_STATE_TTL, JOB_STATE_MAX_JOBS)
+
+
+def update_progress(job_id, **fields):
+    if not job_id:
+        return
+    JOB_STATE.update(job_id, **fields)
+
+
+def set_progress(job_id, data):
+    JOB_STATE.set(job_id, **data)
+
+
+class RetryScheduler:
+    """Hands bookings to workers; failed bookings rejoin the queue after a jittered backoff."""
+
+    def __init__(self, items, max_attempts, base_delay, max_delay):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._ready = deque(items)
+        self._delayed = []  # heap of (ready_at, sequence, item)
+        self._sequence = 0
+        self._attempts = {}
+        self._outstanding = len(self._ready)
+        self._changed = Condition(Lock())
+
+    def get(self):
+        # Blocks until an item is due; returns (item, attempt) or None once everything is finished
+        with self._changed:
+            while True:
+                if self._outstanding == 0:
+                    return None
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    self._ready.append(heapq.heappop(self._delayed)[2])
+                if self._ready:
+                    item = self._ready.popleft()
+                    self._attempts[item] = self._attempts.get(item, 0) + 1
+                    return item, self._attempts[item]
+                self._changed.wait(self._delayed[0][0] - now if self._delayed else None)
+
+    def retry(self, item):
+        # Returns the backoff delay, or None when the item has used up its attempt budget
+        with self._changed:
+            attempts = self._attempts.get(item, 0)
+            if attempts >= self.max_attempts:
+                return None
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            heapq.heappush(self._delayed, (time.monotonic() + delay, self._sequence, item))
+            self._sequence += 1
+            self._changed.notify_all()
+            return delay
+
+    def requeue(self, item):
+        # Put an item straight back without charging the attempt against its budget
+        with self._changed:
+            self._attempts[item] = self._attempts.get(item, 1) - 1
+            self._ready.append(item)
+            self._changed.notify_all()
+
+    def done(self, item):
+        with self._changed:
+            self._outstanding -= 1
+            self._changed.notify_all()
+
+
+class SessionGuard:
+    """Pauses a job's workers while one of them re-authenticates the shared session."""
+
+    def __init__(self, reauthenticate, max_reauthentications):
+        self._reauthenticate = reauthenticate
+        self.max_reauthentications = max_reauthentications
+        self.reauthentications = 0
+        self.generation = 0  # bumped after every re-authentication
+        self._healthy = True
+        self._in_progress = False
+        self._lock = Lock()
+        self._resumed = Event()
+        self._resumed.set()
+
+    def wait(self):
+        self._resumed.wait()
+
+    def recover(self, generation, driver):
+        # Only the first worker to notice re-authenticates; the others wait for its result.
+        # A failure from before the latest re-authentication just needs another try.
+        with self._lock:
+            if self._in_progress or generation != self.generation:
+                leader = False
+            elif self.reauthentications >= self.max_reauthentications:
+                return False
+            else:
+                leader = True
+                self._in_progress = True
+                self._resumed.clear()
+        if not leader:
+            self._resumed.wait()
+            return self._healthy
 
-def scrape_airbnb_invoices(booking_numbers, manual_mfa=False, client_id=None):
-    download_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'invoice_downloads')
-    if not os.path.exists(download_dir):
-        os.makedirs(download_dir)
+        try:
+            self._healthy = bool(self._reauthenticate(driver))
+        except Exception as e:
+            logging.exception(f"Re-authentication failed: {e}")
+            self._healthy = False
+        finally:
+            with self._lock:
+                self.reauthentications += 1
+                self.generation += 1
+                self._in_progress = False
+            self._resumed.set()
+        return self._healthy
+
+
+def scrape_airbnb_invoices(booking_numbers, manual_mfa=False, job_id=None, workers=None, force_refresh=False,
+                           download_dir=None):
+    # Each run works in its own directory so concurrent jobs never touch each other's files
+    run_id = job_id or uuid.uuid4().hex
+    if download_dir is None:
+        download_dir = os.path.join(DOWNLOAD_DIR, run_id)
+    os.makedirs(download_dir, exist_ok=True)
+    # Invoices are appended as bookings finish, so finalizing only writes the central directory
+    archive = InvoiceArchive(os.path.join(download_dir, archive_name(run_id)))
+    if job_id:
+        with JOB_ARCHIVES_LOCK:
+            JOB_ARCHIVES[job_id] = archive
 
     total_bookings = len(booking_numbers)
     failed_downloads = []
+    all_downloaded_files = []
+
+    # Never run more drivers than there are bookings or than the politeness cap allows
+    workers = SCRAPE_WORKERS if workers is None else workers
+    workers = max(1, min(workers, MAX_SCRAPE_WORKERS, total_bookings or 1))
 
-    driver_visible = None
-    driver_headless = None
-    cookie_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'session_cookies.json')
+    drivers = []  # [driver, pages_used] per worker
+    results = {}  # booking index -> (outcome, archived invoice names)
+    results_lock = Lock()
+    network_stats = new_network_stats()
+    cookie_file_path = COOKIE_FILE_PATH
+    unfinished_outcome = OUTCOME_TRANSIENT  # reported for bookings the job never got to
 
     try:
         # Initialize progress with stages
-        if client_id:
-            with PROGRESS_LOCK:
-                PROGRESS[client_id] = { 
-                    'total': total_bookings, 
-                    'current': 0, 
-                    'done': False, 
-                    'status': 'started',
-                    'stage': 'session_check',
-                    'stage_progress': 5,
-                    'total_stages': 4  # session_check, mfa (if needed), downloading, finalizing
-                }
+        if job_id:
+            set_progress(job_id, {
+                'total': total_bookings,
+                'current': 0,
+                'done': False,
+                'status': 'started',
+                'stage': 'session_check',
+                'stage_progress': 5,
+                'total_stages': 4,  # session_check, mfa (if needed), downloading, finalizing
+                # The live archive can only be streamed by a web process; broker workers serve none
+                'streamable': JOB_EXECUTION != 'broker',
+            })
         
-        # Try to use existing cookies with headless browser first
-        driver_headless = initialize_driver(download_dir, headless=True)
-        session_loaded = load_session_cookies(driver_headless, cookie_file_path)
+        # Shared with every other job that uses the same account; every page load of this job's
+        # drivers goes through it, including cookie refreshes and re-authentication
+        limiter = get_rate_limiter(cookie_file_path)
+
+        # Borrow a warm headless driver; it is already authenticated if the saved cookies are valid
+        driver_headless = DRIVER_POOL.acquire()
+        drivers.append([driver_headless, 0])
+        driver_state(driver_headless)['rate_limiter'] = limiter
+        session_loaded = DRIVER_POOL.is_authenticated(driver_headless)
         
         if not session_loaded:
-            # Need MFA - close headless and open visible browser
-            driver_headless.quit()
-            driver_headless = None
-            
+            if not manual_mfa:
+                # Unattended runs have nobody to complete a login
+                raise DownloadFailure(OUTCOME_SESSION_EXPIRED, "Saved session is not valid and interactive login is disabled")
+
             # Update progress to show MFA needed
-            if client_id:
-                with PROGRESS_LOCK:
-                    if client_id in PROGRESS:
-                        PROGRESS[client_id]['status'] = 'mfa_needed'
-                        PROGRESS[client_id]['stage'] = 'mfa'
-                        PROGRESS[client_id]['stage_progress'] = 15
+            update_progress(job_id, status='mfa_needed', stage='mfa', stage_progress=15)
             
-            driver_visible = initialize_driver(download_dir, headless=False)
-            login_to_airbnb(driver_visible, manual_mfa=True)
-            save_session_cookies(driver_visible, cookie_file_path)
-            
-            # Transfer cookies to new headless browser
-            cookies = driver_visible.get_cookies()
-            driver_headless = initialize_driver(download_dir, headless=True)
-            driver_headless.get("https://www.airbnb.com/")
-            for cookie in cookies:
-                sanitized = {
-                    'name': cookie.get('name'),
-                    'value': cookie.get('value'),
-                    'domain': cookie.get('domain'),
-                    'path': cookie.get('path', '/'),
-                    'secure': cookie.get('secure', False),
-                }
-                if 'expiry' in cookie:
-                    sanitized['expiry'] = cookie['expiry']
-                try:
-                    driver_headless.add_cookie(sanitized)
-                except Exception as e:
-                    logging.info(f"Cookie add failed for {sanitized.get('name')}: {e}")
-            
-            # Close visible browser now that headless session is authenticated
-            driver_visible.quit()
-            driver_visible = None
+            # Transfer cookies to the pooled headless browsers
+            DRIVER_POOL.install_cookies(login_with_visible_browser(download_dir, cookie_file_path))
+            DRIVER_POOL.refresh(driver_headless)
+
+        # Extra workers only take drivers the pool can spare right now; they share the same cookies
+        while len(drivers) < workers:
+            try:
+                driver = DRIVER_POOL.acquire(timeout=WORKER_ACQUIRE_TIMEOUT)
+            except TimeoutError:
+                break
+            if not DRIVER_POOL.is_authenticated(driver):
+                DRIVER_POOL.release(driver)
+                break
+            drivers.append([driver, 0])
+            driver_state(driver)['rate_limiter'] = limiter
+
+        http_session = None
+        if INVOICE_FETCH_MODE == 'http':
+            user_agent = driver_headless.execute_script('return navigator.userAgent')
+            http_session = build_http_session(cookie_file_path, user_agent, limiter)
 
         # Update progress to show we're ready to download
-        if client_id:
-            with PROGRESS_LOCK:
-                if client_id in PROGRESS:
-                    PROGRESS[client_id]['status'] = 'downloading'
-                    PROGRESS[client_id]['stage'] = 'downloading'
-                    PROGRESS[client_id]['stage_progress'] = 20
-
-        driver_headless.get("https://www.airbnb.com/hosting/reservations/all")
-        all_downloaded_files = []
-
-        for index, booking_number in enumerate(booking_numbers, start=1):
-            logging.info(f"Downloading invoices for booking {booking_number} ({index} of {total_bookings})")
-
-            success, file_paths = download_invoice(driver_headless, booking_number, download_dir)
-
-            retry_count = 0
-            while not success and retry_count < 5:
-                logging.info(f"Retrying download for booking {booking_number} (Attempt {retry_count + 1})")
-                success, file_paths = download_invoice(driver_headless, booking_number, download_dir)
-                retry_count += 1
-
-            if not success:
-                logging.info(f"Failed to download invoices for booking {booking_number} after 5 attempts")
-                failed_downloads.append(booking_number)
-            else:
-                all_downloaded_files.extend(file_paths)
+        update_progress(job_id, status='downloading', stage='downloading', stage_progress=20)
+        logging.info(f"Downloading {total_bookings} booking(s) with {len(drivers)} worker(s)")
 
-            time.sleep(1)  # Reduced delay between bookings (still respectful to Airbnb)
+        scheduler = RetryScheduler(
+            list(enumerate(booking_numbers)), MAX_BOOKING_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+        )
 
-            # Update progress after processing each booking
-            if client_id:
-                with PROGRESS_LOCK:
-                    PROGRESS[client_id]['current'] = index
+        def reauthenticate(driver):
+            logging.info("Session expired mid-job, re-authenticating")
+            # Cookies saved by another job may already be fresh; otherwise ask the user to log in again
+            if load_session_cookies(driver, cookie_file_path):
+                cookies = driver.get_cookies()
+            elif not manual_mfa:
+                logging.info("Interactive login is disabled, giving up on the expired session")
+                return False
+            else:
+                update_progress(job_id, status='mfa_needed', stage='mfa')
+                cookies = login_with_visible_browser(download_dir, cookie_file_path)
+            # Every pooled driver picks these up before its next booking
+            DRIVER_POOL.install_cookies(cookies)
+            if http_session is not None:
+                load_http_cookies(http_session, cookie_file_path)
+            update_progress(job_id, status='downloading', stage='downloading')
+            return True
+
+        session_guard = SessionGuard(reauthenticate, MAX_REAUTHENTICATIONS)
+
+        def run_worker(slot):
+            driver = slot[0]
+            # Drop events left over from earlier jobs on this pooled driver
+            take_network_stats(driver)
+            try:
+                with rate_limited(driver):
+                    driver.get("https://www.airbnb.com/hosting/reservations/all")
+            except Exception as e:
+                logging.info(f"Worker could not open reservations page: {e}")
+            while True:
+                scheduled = scheduler.get()
+                if scheduled is None:
+                    return
+                item, attempt = scheduled
+                booking_index, booking_number = item
+                settled = False
+                try:
+                    # Hold off while another worker re-authenticates, then pick up the new cookies
+                    session_guard.wait()
+                    generation = session_guard.generation
+                    logging.info(
+                        f"Downloading invoices for booking {booking_number} ({booking_index + 1} of {total_bookings}, "
+                        f"attempt {attempt})"
+                    )
+
+                    try:
+                        DRIVER_POOL.refresh(driver)
+                        outcome, file_paths = download_invoice(
+                            driver, booking_number, download_dir, archive, http_session, force_refresh
+                        )
+                        slot[1] += 1 + len(file_paths)
+                    except Exception as e:
+                        logging.exception(f"Worker error for booking {booking_number}: {e}")
+                        outcome, file_paths = OUTCOME_TRANSIENT, []
+
+                    booking_stats = take_network_stats(driver)
+                    with results_lock:
+                        for key, value in booking_stats.items():
+                            network_stats[key] += value
+
+                    # Throttling or a failed attempt slows the whole account down
+                    if driver_state(driver).pop('throttled', False) or outcome in RETRYABLE_OUTCOMES:
+                        limiter.record(error=True)
+
+                    # A failed attempt that saw Airbnb reject the session is treated as an expired session
+                    if driver_state(driver).pop('unauthorized', False) and outcome not in SUCCESS_OUTCOMES:
+                        outcome = OUTCOME_SESSION_EXPIRED
+                    if outcome == OUTCOME_SESSION_EXPIRED and session_guard.recover(generation, driver):
+                        settled = True
+                        scheduler.requeue(item)
+                        continue
+
+                    # Failed bookings cool down at the back of the queue while healthy ones keep flowing;
+                    # outcomes a retry cannot change are settled right away
+                    if outcome in RETRYABLE_OUTCOMES:
+                        delay = scheduler.retry(item)
+                        if delay is not None:
+                            settled = True
+                            logging.info(f"Retrying booking {booking_number} in {delay:.1f}s ({outcome})")
+                            continue
+                    if outcome not in SUCCESS_OUTCOMES:
+                        logging.info(
+                            f"Failed to download invoices for booking {booking_number} after {attempt} attempt(s) ({outcome})"
+                        )
+
+                    with results_lock:
+                        results[booking_index] = (outcome, file_paths)
+                        completed = len(results)
+                    settled = True
+                    scheduler.done(item)
+
+                    # Update progress after processing each booking
                     # Calculate overall progress: 20% base + 70% for downloads + 10% for finalizing
-                    download_progress = (index / total_bookings) * 70 if total_bookings > 0 else 0
-                    PROGRESS[client_id]['stage_progress'] = 20 + download_progress
+                    download_progress = (completed / total_bookings) * 70 if total_bookings > 0 else 0
+                    update_progress(job_id, current=completed, stage_progress=20 + download_progress)
+                except Exception as e:
+                    logging.exception(f"Worker error after booking {booking_number}: {e}")
+                    # A booking left checked out would keep the other workers and the job waiting forever
+                    if not settled:
+                        if scheduler.retry(item) is None:
+                            with results_lock:
+                                results[booking_index] = (OUTCOME_TRANSIENT, [])
+                            scheduler.done(item)
+
+        if len(drivers) == 1:
+            run_worker(drivers[0])
+        else:
+            threads = [Thread(target=run_worker, args=(slot,), daemon=True) for slot in drivers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
 
     except Exception as e:
         logging.info(f"Error during invoice scraping: {e}")
-        failed_downloads.extend(booking_numbers[index:])
+        if isinstance(e, DownloadFailure):
+            unfinished_outcome = e.outcome
     finally:
+        # Every booking has been added by now. Closing first, before anything else can fail, ends the
+        # live streams of this archive.
         try:
-            if driver_headless is not None:
-                driver_headless.quit()
+            archive.close()
         finally:
-            if driver_visible is not None:
-                driver_visible.quit()
+            for driver, pages_used in drivers:
+                driver_state(driver).pop('rate_limiter', None)
+                # Hand the driver back warm for the next job
+                DRIVER_POOL.release(driver, pages=pages_used)
+
+    logging.info(
+        f"Network: {network_stats['requests']} request(s), {network_stats['bytes_received']} bytes received, "
+        f"{network_stats['blocked_requests']} blocked (~{network_stats['bytes_saved_estimate']} bytes saved)"
+    )
+    update_progress(job_id, network=network_stats)
+
+    # Merge worker results back in booking order; anything never processed counts as failed.
+    # Bookings without invoices are not retried, but are listed so a slow page cannot hide its invoices.
+    failure_reasons = {}
+    no_invoice_bookings = []
+    for booking_index, booking_number in enumerate(booking_numbers):
+        outcome, file_paths = results.get(booking_index, (unfinished_outcome, []))
+        if outcome in SUCCESS_OUTCOMES:
+            all_downloaded_files.extend(file_paths)
+            if outcome == OUTCOME_NO_INVOICES:
+                no_invoice_bookings.append(booking_number)
+        else:
+            failed_downloads.append(booking_number)
+            failure_reasons[booking_number] = outcome
+    update_progress(job_id, failure_reasons=failure_reasons, no_invoice_bookings=no_invoice_bookings)
 
-    # zip the downloaded invoices here using zip_invoices function
-    zip_path = zip_invoices(all_downloaded_files, download_dir)
+    zip_path = archive.path
     logging.info(f"zip path: {zip_path}")
 
     # Final report
@@ -458,34 +2176,39 @@ def scrape_airbnb_invoices(booking_numbers, manual_mfa=False, client_id=None):
             logging.info(booking)
     else:
         logging.info("All invoices downloaded successfully.")
+    if no_invoice_bookings:
+        logging.info(f"No invoices found for: {', '.join(no_invoice_bookings)}")
 
     
     # Mark done in progress store
-    if client_id:
-        with PROGRESS_LOCK:
-            if client_id in PROGRESS:
-                PROGRESS[client_id]['done'] = True
-                PROGRESS[client_id]['stage'] = 'finalizing'
-                PROGRESS[client_id]['stage_progress'] = 90
+    update_progress(job_id, done=True, stage='finalizing', stage_progress=90)
     return all_downloaded_files, download_dir, failed_downloads, zip_path
 
 
 
-def background_scrape(client_id, booking_numbers):
+def release_job_output(job_id, download_dir):
+    with JOB_ARCHIVES_LOCK:
+        JOB_ARCHIVES.pop(job_id, None)
+    JOB_WORKSPACES.release(download_dir)
+
+
+def background_scrape(job_id, booking_numbers, force_refresh=False):
     """Run scraping in background thread"""
+    download_dir = JOB_WORKSPACES.create(job_id)
     try:
         # Capture the returned values from scrape_airbnb_invoices function
-        all_downloaded_files, download_dir, failed_downloads, zip_path = scrape_airbnb_invoices(booking_numbers, manual_mfa=True, client_id=client_id)
+        all_downloaded_files, download_dir, failed_downloads, zip_path = scrape_airbnb_invoices(
+            booking_numbers, manual_mfa=True, job_id=job_id, force_refresh=force_refresh,
+            download_dir=download_dir
+        )
 
-        # Trigger cleanup with a delay
-        cleanup_delay = 30  # seconds, adjust as needed
-        Timer(cleanup_delay, cleanup_files, args=[all_downloaded_files, download_dir]).start()
         # Create a summary report
         report = {
             'total_bookings': len(booking_numbers),
             'successful_downloads': len(all_downloaded_files),
             'failed_downloads': len(failed_downloads),
-            'failed_booking_numbers': failed_downloads
+            'failed_booking_numbers': failed_downloads,
+            'no_invoice_bookings': (JOB_STATE.get(job_id) or {}).get('no_invoice_bookings', []),
         }
 
         logging.info(f"Original zip path: {zip_path}")
@@ -494,19 +2217,340 @@ def background_scrape(client_id, booking_numbers):
         logging.info(f"filename: {zip_path}")
         
         # Store results in progress data for completion check
-        with PROGRESS_LOCK:
-            if client_id in PROGRESS:
-                PROGRESS[client_id]['zip_path'] = zip_path
-                PROGRESS[client_id]['report'] = report
-                PROGRESS[client_id]['done'] = True
-                PROGRESS[client_id]['stage_progress'] = 100
+        update_progress(job_id, zip_path=zip_path, report=report, done=True, stage_progress=100)
                 
     except Exception as e:
         logging.exception(f"Background scrape error: {e}")
-        with PROGRESS_LOCK:
-            if client_id in PROGRESS:
-                PROGRESS[client_id]['error'] = str(e)
-                PROGRESS[client_id]['done'] = True
+        update_progress(job_id, error=str(e), done=True)
+    finally:
+        # Drop the job's own reference once its archive has had time to be downloaded
+        cleanup_timer = Timer(JOB_OUTPUT_TTL, release_job_output, args=[job_id, download_dir])
+        cleanup_timer.daemon = True
+        cleanup_timer.start()
+
+class JobQueueFull(Exception):
+    """Raised when the job queue cannot take another job."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry in about {retry_after}s")
+        self.retry_after = retry_after
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused for a different submission while its job runs."""
+
+    def __init__(self, job_id):
+        super().__init__(f"Idempotency key is already used by job {job_id} with different parameters")
+        self.job_id = job_id
+
+
+class JobScheduler:
+    """Runs jobs on a fixed set of worker threads and queues at most max_queued more."""
+
+    def __init__(self, workers, max_queued, estimated_duration):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.average_duration = estimated_duration
+        self._queue = deque()  # (job_id, target, args)
+        self._running = 0
+        self._condition = Condition()
+        for index in range(workers):
+            Thread(target=self._work, name=f'job-worker-{index}', daemon=True).start()
+
+    def submit(self, job_id, target, *args):
+        with self._condition:
+            if len(self._queue) >= self.max_queued:
+                raise JobQueueFull(self._estimate_wait(len(self._queue)))
+            self._queue.append((job_id, target, args))
+            set_progress(job_id, {
+                'total': 0,
+                'current': 0,
+                'done': False,
+                'status': 'queued',
+                'stage': 'queued',
+                'stage_progress': 0,
+            })
+            self._publish_positions()
+            self._condition.notify()
+
+    def _estimate_wait(self, ahead):
+        # Jobs that have to finish before a free worker reaches this one, spread over the workers
+        blocking = max(0, self._running + ahead - self.workers + 1)
+        return int(blocking * self.average_duration / self.workers + 0.5)
+
+    def _publish_positions(self):
+        for index, (job_id, _, _) in enumerate(self._queue):
+            update_progress(job_id, queue_position=index + 1, estimated_wait=self._estimate_wait(index))
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                job_id, target, args = self._queue.popleft()
+                self._running += 1
+                update_progress(job_id, status='started', queue_position=0, estimated_wait=0)
+                self._publish_positions()
+            started = time.monotonic()
+            try:
+                target(job_id, *args)
+            except Exception as e:
+                logging.exception(f"Job {job_id} failed: {e}")
+            finally:
+                with self._condition:
+                    self._running -= 1
+                    # Smoothed duration of recent jobs feeds the wait estimates
+                    self.average_duration = 0.8 * self.average_duration + 0.2 * (time.monotonic() - started)
+                    self._publish_positions()
+
+
+class SqliteJobBroker:
+    """Job queue in a SQLite database: the web process enqueues, worker processes claim and run."""
+
+    def __init__(self, path, max_queued, workers, estimated_duration, stale_after):
+        self.path = path
+        self.max_queued = max_queued
+        self.workers = workers  # assumed worker count, for wait estimates
+        self.estimated_duration = estimated_duration
+        self.stale_after = stale_after
+        self._db = None
+        self._lock = Lock()
+
+    def submit(self, job_id, target, *args):
+        if JOB_TARGETS.get(target.__name__) is not target:
+            raise ValueError(f"{target.__name__} cannot be run by a job worker")
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                queued = db.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+                if queued >= self.max_queued:
+                    raise JobQueueFull(self._estimate_wait(db, queued))
+                # Published before the job becomes claimable, so a worker's 'started' is never overwritten
+                set_progress(job_id, {
+                    'total': 0,
+                    'current': 0,
+                    'done': False,
+                    'status': 'queued',
+                    'stage': 'queued',
+                    'stage_progress': 0,
+                })
+                db.execute(
+                    "INSERT INTO jobs (job_id, target, args, state, enqueued) VALUES (?, ?, ?, 'queued', ?)",
+                    (job_id, target.__name__, json.dumps(args), time.time()),
+                )
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        self._publish_positions()
+
+    def claim(self, worker_id):
+        """Take the oldest queued job as (job_id, target, args), or None when the queue is empty."""
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose worker stopped sending heartbeats go back to the front of the queue
+                requeued = db.execute(
+                    "UPDATE jobs SET state = 'queued', claimed_by = NULL WHERE state = 'running' AND heartbeat < ?",
+                    (time.time() - self.stale_after,),
+                ).rowcount
+                if requeued:
+                    logging.warning(f"Requeued {requeued} job(s) from unresponsive workers")
+                row = db.execute(
+                    "SELECT job_id, target, args FROM jobs WHERE state = 'queued' ORDER BY enqueued LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    db.execute(
+                        "UPDATE jobs SET state = 'running', claimed_by = ?, started = ?, heartbeat = ? WHERE job_id = ?",
+                        (worker_id, now, now, row[0]),
+                    )
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        if row is None:
+            return None
+        update_progress(row[0], status='started', queue_position=0, estimated_wait=0)
+        self._publish_positions()
+        return row[0], JOB_TARGETS[row[1]], json.loads(row[2])
+
+    def heartbeat(self, worker_id):
+        with self._lock:
+            self._connect().execute(
+                "UPDATE jobs SET heartbeat = ? WHERE claimed_by = ? AND state = 'running'", (time.time(), worker_id)
+            )
+
+    def finish(self, job_id, worker_id):
+        with self._lock:
+            db = self._connect()
+            now = time.time()
+            # A job requeued as stale may be running elsewhere by now; only its current worker may finish it
+            finished = db.execute(
+                "UPDATE jobs SET state = 'done', finished = ? WHERE job_id = ? AND claimed_by = ?",
+                (now, job_id, worker_id),
+            ).rowcount
+            if not finished:
+                logging.warning(f"Job {job_id} is no longer claimed by {worker_id}, leaving it as it is")
+            # Finished rows are only kept for duration estimates
+            db.execute("DELETE FROM jobs WHERE state = 'done' AND finished < ?", (now - JOB_STATE_TTL,))
+        self._publish_positions()
+
+    def requeue(self, worker_id):
+        # Hand a stopping worker's running jobs straight back instead of waiting for them to go stale
+        with self._lock:
+            requeued = self._connect().execute(
+                "UPDATE jobs SET state = 'queued', claimed_by = NULL WHERE claimed_by = ? AND state = 'running'",
+                (worker_id,),
+            ).rowcount
+        if requeued:
+            logging.warning(f"Requeued {requeued} unfinished job(s) of {worker_id}")
+            self._publish_positions()
+
+    def _estimate_wait(self, db, ahead):
+        running = db.execute("SELECT COUNT(*) FROM jobs WHERE state = 'running'").fetchone()[0]
+        durations = [row[0] for row in db.execute(
+            "SELECT finished - started FROM jobs WHERE state = 'done' ORDER BY finished DESC LIMIT 20"
+        )]
+        average_duration = sum(durations) / len(durations) if durations else self.estimated_duration
+        # Same model as JobScheduler: jobs that have to finish before a worker reaches this one
+        blocking = max(0, running + ahead - self.workers + 1)
+        return int(blocking * average_duration / self.workers + 0.5)
+
+    def _publish_positions(self):
+        with self._lock:
+            db = self._connect()
+            queued = [row[0] for row in db.execute(
+                "SELECT job_id FROM jobs WHERE state = 'queued' ORDER BY enqueued"
+            )]
+            waits = [self._estimate_wait(db, index) for index in range(len(queued))]
+        for index, job_id in enumerate(queued):
+            update_progress(job_id, queue_position=index + 1, estimated_wait=waits[index])
+
+    def _connect(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Autocommit mode; claims and submissions open their own transactions
+            self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, target TEXT, args TEXT, state TEXT, "
+                "enqueued REAL, claimed_by TEXT, started REAL, heartbeat REAL, finished REAL)"
+            )
+        return self._db
+
+
+def run_job_worker(concurrency=1):
+    """Claim and run brokered jobs on this many threads until SIGTERM or Ctrl-C, then drain."""
+    if not isinstance(JOB_SCHEDULER, SqliteJobBroker):
+        raise RuntimeError("Job workers need JOB_EXECUTION=broker")
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    logging.info(f"Job worker {worker_id} started with {concurrency} thread(s)")
+    stopping = Event()
+
+    def heartbeat():
+        while True:
+            time.sleep(JOB_BROKER_HEARTBEAT)
+            try:
+                JOB_SCHEDULER.heartbeat(worker_id)
+            except Exception as e:
+                logging.error(f"Heartbeat failed: {e}")
+
+    def work():
+        while not stopping.is_set():
+            try:
+                claimed = JOB_SCHEDULER.claim(worker_id)
+            except Exception as e:
+                logging.error(f"Claiming a job failed: {e}")
+                claimed = None
+            if claimed is None:
+                stopping.wait(JOB_BROKER_POLL_INTERVAL)
+                continue
+            job_id, target, args = claimed
+            logging.info(f"Worker {worker_id} running job {job_id}")
+            try:
+                target(job_id, *args)
+            except Exception as e:
+                logging.exception(f"Job {job_id} failed: {e}")
+            finally:
+                JOB_SCHEDULER.finish(job_id, worker_id)
+
+    def request_stop(signum, frame):
+        logging.info(f"Job worker {worker_id} stopping, waiting up to {JOB_WORKER_DRAIN_TIMEOUT:.0f}s for running jobs")
+        stopping.set()
+
+    # Process managers stop workers with SIGTERM
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    Thread(target=heartbeat, daemon=True).start()
+    workers = [Thread(target=work, name=f'job-worker-{index}', daemon=True) for index in range(concurrency)]
+    for thread in workers:
+        thread.start()
+    while not stopping.wait(1):
+        pass
+
+    deadline = time.monotonic() + JOB_WORKER_DRAIN_TIMEOUT
+    for thread in workers:
+        thread.join(max(0, deadline - time.monotonic()))
+    if any(thread.is_alive() for thread in workers):
+        # Another worker takes the jobs over. Borrowed browsers are quit too, since exiting would
+        # orphan their Chrome and chromedriver processes.
+        JOB_SCHEDULER.requeue(worker_id)
+        DRIVER_POOL.shutdown(in_use=True)
+        RENDERER_POOL.shutdown(in_use=True)
+    logging.info(f"Job worker {worker_id} stopped")
+
+
+# Functions a brokered job may name; anything else is refused
+JOB_TARGETS = {'background_scrape': background_scrape}
+
+if JOB_EXECUTION == 'broker':
+    JOB_SCHEDULER = SqliteJobBroker(JOB_BROKER_DB, JOB_QUEUE_SIZE, JOB_WORKERS, JOB_ESTIMATED_SECONDS, JOB_BROKER_STALE)
+else:
+    JOB_SCHEDULER = JobScheduler(JOB_WORKERS, JOB_QUEUE_SIZE, JOB_ESTIMATED_SECONDS)
+
+
+def job_finished(data):
+    return 'zip_path' in data or 'error' in data
+
+
+def submit_job(client_id, booking_numbers, force_refresh=False, idempotency_key=None):
+    """Queue a scrape and return its job id; an identical in-flight submission returns the existing job."""
+    fingerprint = hashlib.sha256(json.dumps([client_id, booking_numbers, force_refresh]).encode('utf-8')).hexdigest()
+    if idempotency_key is None:
+        idempotency_key = fingerprint
+    else:
+        # A caller's own key is scoped to its client, so it can never resolve to another client's job
+        idempotency_key = hashlib.sha256(json.dumps([client_id, idempotency_key]).encode('utf-8')).hexdigest()
+    with ACTIVE_JOBS_LOCK:
+        active = ACTIVE_JOBS.get(idempotency_key)
+        if active is not None:
+            job_id, active_fingerprint = active
+            data = JOB_STATE.get(job_id)
+            if data is not None and not job_finished(data):
+                if active_fingerprint != fingerprint:
+                    raise IdempotencyConflict(job_id)
+                logging.info(f"Duplicate submission from client {client_id}, reusing job {job_id}")
+                return job_id
+        # Forget fingerprints of jobs that have finished since they were submitted
+        for key, (active_id, _) in list(ACTIVE_JOBS.items()):
+            data = JOB_STATE.get(active_id)
+            if data is None or job_finished(data):
+                del ACTIVE_JOBS[key]
+        job_id = uuid.uuid4().hex
+        JOB_SCHEDULER.submit(job_id, background_scrape, booking_numbers, force_refresh)
+        ACTIVE_JOBS[idempotency_key] = (job_id, fingerprint)
+    logging.info(f"Queued job {job_id} for client {client_id} ({len(booking_numbers)} booking(s))")
+    return job_id
+
+
+def busy_message(retry_after):
+    minutes = max(1, (retry_after + 59) // 60)
+    return f"We are busy processing other downloads. Please try again in about {minutes} minute(s)."
+
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -515,37 +2559,173 @@ def index():
 
         # Filter out empty strings from booking_numbers
         booking_numbers = [number.strip() for number in booking_numbers if number.strip()]
+        # Re-render invoices even if they are already cached
+        force_refresh = request.form.get('force_refresh') == 'on'
 
-        # Ensure we have a client_id to track progress
+        # The client id scopes duplicate detection to this browser
         if 'client_id' not in session:
             session['client_id'] = str(uuid.uuid4())
         client_id = session['client_id']
 
-        # Start background scraping
-        thread = Thread(target=background_scrape, args=(client_id, booking_numbers))
-        thread.daemon = True
-        thread.start()
+        # Queue the scrape; when the queue is full, tell the user how long to wait
+        try:
+            job_id = submit_job(client_id, booking_numbers, force_refresh)
+        except JobQueueFull as e:
+            logging.info(f"Rejected job for client {client_id}: {e}")
+            response = make_response(render_template('index.html', error=busy_message(e.retry_after)), 429)
+            response.headers['Retry-After'] = str(max(1, e.retry_after))
+            return response
 
-        return render_template('progress.html', client_id=client_id)
+        # The latest job backs the session-based /progress and /complete_check endpoints
+        session['job_id'] = job_id
+        return render_template('progress.html', job_id=job_id)
 
     return render_template('index.html')
 
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({ 'error': 'request body must be a JSON object' }), 400
+    booking_numbers = payload.get('booking_numbers')
+    if not isinstance(booking_numbers, list) or not all(isinstance(number, str) for number in booking_numbers):
+        return jsonify({ 'error': 'booking_numbers must be a list of strings' }), 400
+    booking_numbers = [number.strip() for number in booking_numbers if number.strip()]
+    if not booking_numbers:
+        return jsonify({ 'error': 'booking_numbers is required' }), 400
+    if not isinstance(payload.get('force_refresh', False), bool):
+        return jsonify({ 'error': 'force_refresh must be a boolean' }), 400
+
+    if 'client_id' not in session:
+        session['client_id'] = str(uuid.uuid4())
+    try:
+        job_id = submit_job(
+            session['client_id'], booking_numbers, payload.get('force_refresh', False),
+            idempotency_key=request.headers.get('Idempotency-Key'),
+        )
+    except IdempotencyConflict as e:
+        return jsonify({ 'error': str(e) }), 422
+    except JobQueueFull as e:
+        response = jsonify({ 'error': busy_message(e.retry_after), 'retry_after': e.retry_after })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, e.retry_after))
+        return response
+    return jsonify({
+        'job_id': job_id,
+        'progress_url': url_for('job_progress', job_id=job_id),
+        'download_url': url_for('job_download', job_id=job_id),
+    }), 202
+
+@app.route('/jobs/<job_id>/progress', methods=['GET'])
+def job_progress(job_id):
+    data = JOB_STATE.get(job_id)
+    if data is None:
+        return jsonify({ 'error': 'unknown job' }), 404
+    return jsonify(data)
+
+@app.route('/jobs/<job_id>/download', methods=['GET'])
+def job_download(job_id):
+    data = JOB_STATE.get(job_id) or {}
+    if not data:
+        abort(404)
+    if 'zip_path' not in data:
+        return jsonify({ 'error': 'job has not finished', 'status': data.get('status') }), 409
+    # Hold the job's directory until the file has been sent, even if its retention ends meanwhile
+    download_dir = JOB_WORKSPACES.acquire(job_id)
+    if download_dir is None:
+        abort(404)
+    full_path = os.path.join(download_dir, data['zip_path'])
+    if not os.path.isfile(full_path):
+        JOB_WORKSPACES.release(download_dir)
+        abort(404)
+
+    def stream_archive():
+        with open(full_path, 'rb') as archive:
+            while True:
+                chunk = archive.read(PDF_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    # Not send_file: its passthrough responses skip call_on_close, which releases the directory
+    # once the transfer ends or the client goes away
+    response = app.response_class(stream_archive(), mimetype='application/zip')
+    response.headers['Content-Length'] = str(os.path.getsize(full_path))
+    response.headers['Content-Disposition'] = f'attachment; filename="{data["zip_path"]}"'
+    response.call_on_close(lambda: JOB_WORKSPACES.release(download_dir))
+    return response
+
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+def job_stream(job_id):
+    # Sends the ZIP while the job is still running; members arrive as their bookings finish
+    data = JOB_STATE.get(job_id) or {}
+    if not data:
+        abort(404)
+    with JOB_ARCHIVES_LOCK:
+        archive = JOB_ARCHIVES.get(job_id)
+    if archive is None:
+        if 'zip_path' in data:
+            # Finished, or run by another process: serve the completed archive instead
+            return job_download(job_id)
+        if job_finished(data):
+            abort(404)
+        response = jsonify({ 'error': 'archive is not available yet', 'status': data.get('status') })
+        response.status_code = 409
+        response.headers['Retry-After'] = str(max(1, data.get('estimated_wait', 1)))
+        return response
+    download_dir = JOB_WORKSPACES.acquire(job_id)
+    if download_dir is None:
+        abort(404)
+
+    # No Content-Length, so the body goes out with chunked transfer encoding
+    response = app.response_class(stream_zip(archive.follow(STREAM_IDLE_TIMEOUT)), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{os.path.basename(archive.path)}"'
+    response.call_on_close(lambda: JOB_WORKSPACES.release(download_dir))
+    return response
+
 @app.route('/progress', methods=['GET'])
 def progress():
-    client_id = session.get('client_id')
-    if not client_id:
+    job_id = session.get('job_id')
+    if not job_id:
         return jsonify({ 'total': 0, 'current': 0, 'done': False, 'status': 'no_session' })
-    with PROGRESS_LOCK:
-        data = PROGRESS.get(client_id, { 'total': 0, 'current': 0, 'done': False, 'status': 'not_started' })
+    data = JOB_STATE.get(job_id) or { 'total': 0, 'current': 0, 'done': False, 'status': 'not_started' }
     return jsonify(data)
 
+@app.route('/progress/stream', methods=['GET'])
+def progress_stream():
+    # Server-sent events: one 'progress' event per change, then a 'complete' event with the redirect
+    job_id = request.args.get('job_id') or session.get('job_id')
+    if JOB_STATE.get(job_id) is None:
+        abort(404)
+
+    def events():
+        last_version = None
+        while True:
+            version, data = JOB_STATE.wait(job_id, last_version, PROGRESS_KEEPALIVE)
+            if data is None:
+                return
+            if version == last_version:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            last_version = version
+            yield f"event: progress\ndata: {json.dumps(data)}\n\n"
+            if job_finished(data):
+                redirect_url = url_for('complete', job_id=job_id) if 'zip_path' in data else None
+                yield f"event: complete\ndata: {json.dumps({ 'redirect': redirect_url })}\n\n"
+                return
+
+    response = app.response_class(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/complete_check', methods=['GET'])
 def complete_check():
-    client_id = session.get('client_id')
-    if not client_id:
+    job_id = request.args.get('job_id') or session.get('job_id')
+    if not job_id:
         return jsonify({ 'done': False })
-    with PROGRESS_LOCK:
-        data = PROGRESS.get(client_id, { 'done': False })
+    data = JOB_STATE.get(job_id) or { 'done': False }
     if data.get('done') and 'zip_path' in data:
         # Store in session for the complete page
         session['zip_path'] = data['zip_path']
@@ -555,15 +2735,21 @@ def complete_check():
 
 @app.route('/download_zip/<filename>')
 def download_zip(filename):
-    full_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'invoice_downloads', filename)
-    if not os.path.isfile(full_path):
+    # Archives are named after their job, see archive_name
+    match = re.fullmatch(r'invoices_([\w-]+)\.zip', filename)
+    if not match:
         abort(404)
-    return send_file(full_path, as_attachment=True)
+    return job_download(match.group(1))
 
 
 
 @app.route('/complete', methods=['GET'])
 def complete():
+    job_id = request.args.get('job_id')
+    if job_id:
+        data = JOB_STATE.get(job_id) or {}
+        if 'zip_path' in data:
+            return render_template('complete.html', report=data['report'], zip_path=data['zip_path'])
     if 'report' in session:
         report = session['report']
         return render_template('complete.html', report=report, zip_path=session.get('zip_path'))
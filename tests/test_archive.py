@@ -0,0 +1,62 @@
+import io
+import zipfile
+
+import pytest
+
+import app
+
+
+def read_zip(data):
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    return {name: archive.read(name) for name in archive.namelist()}
+
+
+def test_stream_zip_round_trip():
+    members = [('invoice_HM1_1.pdf', b'%PDF one'), ('invoice_HM1_2.pdf', b''), ('fäktura.pdf', b'x' * 70000)]
+    assert read_zip(b''.join(app.stream_zip(members))) == dict(members)
+
+
+def test_stream_zip_without_members_is_an_empty_archive():
+    assert read_zip(b''.join(app.stream_zip([]))) == {}
+
+
+def test_follow_streams_every_member_of_a_closed_archive(tmp_path):
+    archive = app.InvoiceArchive(str(tmp_path / 'invoices.zip'))
+    archive.add('invoice_HM1_1.pdf', b'%PDF one')
+    source = tmp_path / 'cached.pdf'
+    source.write_bytes(b'%PDF cached')
+    with open(source, 'rb') as f:
+        archive.add_file('invoice_HM1_2.pdf', f)
+    archive.close()
+
+    expected = {'invoice_HM1_1.pdf': b'%PDF one', 'invoice_HM1_2.pdf': b'%PDF cached'}
+    assert read_zip(b''.join(app.stream_zip(archive.follow(1)))) == expected
+    with open(archive.path, 'rb') as f:
+        assert read_zip(f.read()) == expected
+
+
+def test_archive_skips_names_it_already_holds(tmp_path):
+    archive = app.InvoiceArchive(str(tmp_path / 'invoices.zip'))
+    archive.add('invoice_HM1_1.pdf', b'first')
+    archive.add('invoice_HM1_1.pdf', b'retry')
+    archive.close()
+
+    with zipfile.ZipFile(archive.path) as f:
+        assert f.namelist() == ['invoice_HM1_1.pdf']
+        assert f.read('invoice_HM1_1.pdf') == b'first'
+
+
+def test_archive_invoices_writes_nothing_when_a_cached_file_is_gone(tmp_path):
+    archive = app.InvoiceArchive(str(tmp_path / 'invoices.zip'))
+    present = tmp_path / 'present.pdf'
+    present.write_bytes(b'%PDF')
+    with pytest.raises(FileNotFoundError):
+        app.archive_invoices(archive, 'HM1', [str(present), str(tmp_path / 'evicted.pdf')])
+    assert archive.entries == []
+
+
+def test_follow_gives_up_when_the_archive_stays_idle(tmp_path):
+    archive = app.InvoiceArchive(str(tmp_path / 'invoices.zip'))
+    with pytest.raises(TimeoutError):
+        next(archive.follow(0.05))
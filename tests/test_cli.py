@@ -0,0 +1,36 @@
+from airbnbinvoicex.__main__ import read_booking_numbers
+
+
+def write_csv(tmp_path, content, encoding='utf-8'):
+    path = tmp_path / 'bookings.csv'
+    path.write_bytes(content.encode(encoding))
+    return str(path)
+
+
+def test_airbnb_reservations_export_header(tmp_path):
+    path = write_csv(tmp_path, 'Confirmation code,Status,Guest name\nHMAAA,Confirmed,A\nHMBBB,Confirmed,B\n')
+    assert read_booking_numbers(path) == ['HMAAA', 'HMBBB']
+
+
+def test_byte_order_mark_does_not_hide_the_header(tmp_path):
+    path = write_csv(tmp_path, 'Confirmation code,Status\nHMAAA,Confirmed\n', encoding='utf-8-sig')
+    assert read_booking_numbers(path) == ['HMAAA']
+
+
+def test_header_matching_ignores_case_spaces_and_hyphens(tmp_path):
+    path = write_csv(tmp_path, 'Guest,Booking-Number\nA,HMAAA\n')
+    assert read_booking_numbers(path) == ['HMAAA']
+
+
+def test_without_a_header_the_first_column_is_used(tmp_path):
+    path = write_csv(tmp_path, 'HMAAA,x\nHMBBB,y\n')
+    assert read_booking_numbers(path) == ['HMAAA', 'HMBBB']
+
+
+def test_blank_rows_and_duplicates_are_skipped(tmp_path):
+    path = write_csv(tmp_path, 'booking_number\nHMAAA\n\n , \nHMAAA\nHMBBB\n')
+    assert read_booking_numbers(path) == ['HMAAA', 'HMBBB']
+
+
+def test_empty_file(tmp_path):
+    assert read_booking_numbers(write_csv(tmp_path, '')) == []
@@ -0,0 +1,30 @@
+import app
+
+RESERVATIONS = {
+    'data': {
+        'reservations': [
+            {'confirmation_code': 'HMAAA', 'invoices': [{'url': '/vat_invoices/111'}]},
+            {
+                'confirmationCode': 'HMBBB',
+                'vat_invoice_url': 'https://www.airbnb.com/vat_invoices/222?locale=en&currency=EUR',
+            },
+        ],
+    },
+}
+
+
+def test_only_the_bookings_own_object_contributes_links():
+    assert app.booking_invoice_hrefs(RESERVATIONS, 'HMAAA') == ['https://www.airbnb.com/vat_invoices/111']
+    assert app.booking_invoice_hrefs(RESERVATIONS, 'HMBBB') == [
+        'https://www.airbnb.com/vat_invoices/222?locale=en&currency=EUR'
+    ]
+
+
+def test_a_payload_that_only_mentions_the_booking_yields_nothing():
+    payload = {'recent_searches': ['HMCCC'], 'reservations': RESERVATIONS['data']['reservations']}
+    assert app.booking_invoice_hrefs(payload, 'HMCCC') == []
+
+
+def test_escaped_json_strings_are_unescaped():
+    body = '{"url": "\\/vat_invoices\\/333?a=1\\u0026b=2"}'
+    assert app.extract_invoice_hrefs(body) == ['https://www.airbnb.com/vat_invoices/333?a=1&b=2']
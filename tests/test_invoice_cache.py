@@ -0,0 +1,60 @@
+import os
+
+import app
+
+
+def make_cache(tmp_path, max_bytes=10000):
+    return app.InvoiceCache(str(tmp_path / 'cache'), ttl=3600, links_ttl=3600, max_bytes=max_bytes)
+
+
+def test_store_and_lookup(tmp_path):
+    cache = make_cache(tmp_path)
+    path = cache.store('HM1', 'https://www.airbnb.com/vat_invoices/1', b'%PDF one')
+    assert cache.lookup('HM1', 'https://www.airbnb.com/vat_invoices/1') == path
+    assert cache.lookup('HM2', 'https://www.airbnb.com/vat_invoices/1') is None
+
+
+def test_lookup_booking_needs_every_invoice(tmp_path):
+    cache = make_cache(tmp_path)
+    hrefs = ['https://www.airbnb.com/vat_invoices/1', 'https://www.airbnb.com/vat_invoices/2']
+    cache.store('HM1', hrefs[0], b'%PDF one')
+    cache.store_booking('HM1', hrefs)
+    assert cache.lookup_booking('HM1') is None
+    cache.store('HM1', hrefs[1], b'%PDF two')
+    assert len(cache.lookup_booking('HM1')) == 2
+
+
+def test_size_cap_evicts_least_recently_used_files(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=2500)
+    first = cache.store('HM1', 'a', b'1' * 1000)
+    second = cache.store('HM2', 'b', b'2' * 1000)
+    cache.lookup('HM1', 'a')
+    third = cache.store('HM3', 'c', b'3' * 1000)
+    assert not os.path.exists(second)
+    assert os.path.exists(first) and os.path.exists(third)
+    assert cache.lookup('HM2', 'b') is None
+
+
+def expire(cache, booking_number):
+    cache._connect().execute("UPDATE invoices SET created = 0 WHERE booking_number = ?", (booking_number,))
+    # Force the next store to sweep
+    cache._next_sweep = 0
+
+
+def test_expired_files_are_removed(tmp_path):
+    cache = make_cache(tmp_path)
+    old = cache.store('HM1', 'a', b'old')
+    expire(cache, 'HM1')
+    cache.store('HM2', 'b', b'new')
+    assert not os.path.exists(old)
+    assert cache.lookup('HM1', 'a') is None
+
+
+def test_shared_content_survives_expiry_of_one_entry(tmp_path):
+    cache = make_cache(tmp_path)
+    path = cache.store('HM1', 'a', b'same')
+    cache.store('HM2', 'b', b'same')
+    expire(cache, 'HM1')
+    cache.store('HM3', 'c', b'other')
+    assert os.path.exists(path)
+    assert cache.lookup('HM2', 'b') == path
@@ -0,0 +1,57 @@
+import app
+
+
+def test_update_publishes_a_new_snapshot():
+    store = app.JobStateStore(ttl=60, max_jobs=10)
+    store.set('job', total=2, current=0)
+    before = store.get('job')
+    store.update('job', current=1)
+    assert store.get('job') == {'total': 2, 'current': 1}
+    assert before == {'total': 2, 'current': 0}
+
+
+def test_update_of_an_unknown_job_is_ignored():
+    store = app.JobStateStore(ttl=60, max_jobs=10)
+    store.update('missing', current=1)
+    assert store.get('missing') is None
+
+
+def test_wait_returns_once_the_version_changes():
+    store = app.JobStateStore(ttl=60, max_jobs=10)
+    store.set('job', current=0)
+    version, _ = store.wait('job', None, 0)
+    assert store.wait('job', version, 0.01) == (version, {'current': 0})
+    store.update('job', current=1)
+    new_version, data = store.wait('job', version, 0.01)
+    assert new_version != version and data == {'current': 1}
+
+
+def test_eviction_drops_the_oldest_finished_jobs_but_never_running_ones():
+    store = app.JobStateStore(ttl=3600, max_jobs=3)
+    store.set('running', status='downloading')
+    store.set('old', zip_path='old.zip')
+    store.set('new', zip_path='new.zip')
+    store.set('next', status='queued')
+    assert store.get('old') is None
+    assert store.get('running') is not None
+    assert store.get('new') is not None
+    assert store.get('next') is not None
+
+
+def test_expired_finished_jobs_are_evicted():
+    store = app.JobStateStore(ttl=0, max_jobs=10)
+    store.set('done', error='failed')
+    store.set('other', status='queued')
+    assert store.get('done') is None
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    store = app.SqliteJobStateStore(str(tmp_path / 'state.sqlite3'), ttl=60, max_jobs=10, poll_interval=0.01)
+    store.set('job', total=1, current=0)
+    store.update('job', current=1, no_invoice_bookings=['HM1'])
+    assert store.get('job') == {'total': 1, 'current': 1, 'no_invoice_bookings': ['HM1']}
+
+    other_process = app.SqliteJobStateStore(str(tmp_path / 'state.sqlite3'), ttl=60, max_jobs=10, poll_interval=0.01)
+    version, data = other_process.wait('job', None, 0)
+    assert data['current'] == 1
+    assert other_process.wait('job', version, 0.02)[0] == version
@@ -0,0 +1,43 @@
+import pytest
+
+import app
+
+SETTINGS = dict(rate=1, min_rate=0.2, max_rate=4, burst=3, increase=0.1, decrease=0.5, target_latency=5)
+
+
+def test_rate_grows_on_fast_responses_and_halves_on_errors():
+    limiter = app.RateLimiter(**SETTINGS)
+    limiter.record(latency=0.1)
+    assert limiter.rate == pytest.approx(1.1)
+    limiter.record(error=True)
+    assert limiter.rate == pytest.approx(0.55)
+    # Several workers report the same slowdown; only one decrease per second counts
+    limiter.record(latency=10)
+    assert limiter.rate == pytest.approx(0.55)
+
+
+def test_rate_stays_within_its_bounds():
+    limiter = app.RateLimiter(**dict(SETTINGS, rate=4))
+    limiter.record(latency=0.1)
+    assert limiter.rate == 4
+    limiter = app.RateLimiter(**dict(SETTINGS, rate=0.3))
+    limiter.record(error=True)
+    assert limiter.rate == 0.2
+
+
+def test_sqlite_limiters_share_one_bucket(tmp_path):
+    path = str(tmp_path / 'broker.sqlite3')
+    settings = tuple(SETTINGS.values())
+    first = app.SqliteRateLimiter(path, 'account', *settings)
+    second = app.SqliteRateLimiter(path, 'account', *settings)
+    other_account = app.SqliteRateLimiter(path, 'other', *settings)
+
+    first.acquire()
+    second.acquire()
+    assert second._tokens == pytest.approx(1, abs=0.1)
+    other_account.acquire()
+    assert other_account._tokens == pytest.approx(2, abs=0.1)
+
+    first.record(error=True)
+    second.record(latency=0.1)
+    assert second.rate == pytest.approx(0.6)
@@ -0,0 +1,44 @@
+import app
+
+
+def make_scheduler(items, max_attempts=3):
+    return app.RetryScheduler(items, max_attempts, base_delay=0, max_delay=0)
+
+
+def test_items_are_handed_out_in_order_until_done():
+    scheduler = make_scheduler(['a', 'b'])
+    assert scheduler.get() == ('a', 1)
+    assert scheduler.get() == ('b', 1)
+    scheduler.done('a')
+    scheduler.done('b')
+    assert scheduler.get() is None
+
+
+def test_retry_stops_once_the_attempt_budget_is_used():
+    scheduler = make_scheduler(['a'], max_attempts=3)
+    for attempt in (1, 2, 3):
+        assert scheduler.get() == ('a', attempt)
+        if attempt < 3:
+            assert scheduler.retry('a') is not None
+    assert scheduler.retry('a') is None
+    scheduler.done('a')
+    assert scheduler.get() is None
+
+
+def test_requeue_does_not_charge_an_attempt():
+    scheduler = make_scheduler(['a'], max_attempts=1)
+    assert scheduler.get() == ('a', 1)
+    scheduler.requeue('a')
+    assert scheduler.get() == ('a', 1)
+    assert scheduler.retry('a') is None
+
+
+def test_backoff_delay_doubles_up_to_the_cap_with_jitter():
+    scheduler = app.RetryScheduler(['a'], max_attempts=5, base_delay=0.01, max_delay=0.03)
+    delays = []
+    for _ in range(4):
+        scheduler.get()
+        delays.append(scheduler.retry('a'))
+    # Each delay is drawn from the upper half of min(max_delay, base_delay * 2 ** (attempt - 1))
+    for delay, ceiling in zip(delays, (0.01, 0.02, 0.03, 0.03)):
+        assert ceiling / 2 <= delay <= ceiling